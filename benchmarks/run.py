@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from polymorphy import Seq, Word, warmup
+from polymorphy import dsl
+from polymorphy.optimize import optimize
+from polymorphy.constants import *
+from polymorphy.patterns import *
+
+
+# Набор замеров производительности: построение Seq и разбор, Word.constrain и inflect,
+# каждый класс шаблонов на коротком и длинном неоднозначном предложении, вложенные повторы
+# и компиляция DSL. Тексты берутся из sample.txt, сеть и внешние корпуса не нужны.
+#
+# Замер - функция без аргументов; она повторяется, пока не наберётся min_time секунд,
+# и так repeat раз. В результат идут лучшее и медианное время одного вызова.
+#
+#   ./bench                                   - все замеры
+#   ./bench -k pattern                        - замеры, имя которых содержит pattern
+#   ./bench --json current.json               - сохранить результаты
+#   ./bench --baseline base.json --max 10     - сравнить с сохранёнными; код выхода 1,
+#                                               если какой-то замер медленнее больше чем на 10%
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample.txt')
+
+RULES = [
+    'seq { ADJF NOUN }',
+    'same(GNdr NMbr CAse) { seq { repeat { ADJF } NOUN } }',
+    'seq { PREP any { NOUN NPRO } }',
+    'seq { lexeme("быть") maybe { ADVB } repeat(1:3) { ADJF } }',
+    'all { NOUN repeat { ANY } }',
+    'seq { @obj word("и") @obj } @obj: same(CAse) { seq { maybe { ADJF } NOUN } }',
+    'seq { $verb: VERB maybe { $adv: ADVB } $obj: seq { repeat(:2) { ADJF } NOUN } }',
+]
+
+
+def load_sample():
+    with open(SAMPLE, 'r') as file:
+        return [re.sub(r'[^\w\s-]', ' ', line).strip() for line in file if line.strip()]
+
+
+def benchmarks(texts):
+    cases  = {}
+    seqs   = [Seq(text) for text in texts]
+    short  = Seq('зеленый стол стоит в углу')
+    long   = Seq(' '.join(texts[:4]))
+    words  = [word for seq in seqs for word in seq]
+    tokens = [word.text for word in words]
+    for word in words: word.variants
+
+    def analyze_cold():
+        Word.cache.clear()
+        for text in texts:
+            for word in Seq(text): word.variants
+    cases['seq.analyze_cold'] = analyze_cold
+
+    def construct_warm():
+        for text in texts:
+            for word in Seq(text): word.variants
+    cases['seq.construct_warm'] = construct_warm
+
+    cases['seq.batch'] = lambda: Seq.batch(texts)
+
+    def constrain():
+        for text in tokens:
+            word = Word(text)
+            word.constrain(NOUN)
+            word.constrain(gent)
+            word.constrain(ADJF)
+    cases['word.constrain'] = constrain
+
+    def inflect_cold():
+        Word.inflect_cache.clear()
+        for word in words: word.inflect({gent, plur})
+    cases['word.inflect_cold'] = inflect_cold
+
+    def inflect_warm():
+        for word in words: word.inflect({gent, plur})
+    cases['word.inflect_warm'] = inflect_warm
+
+    patterns = {
+        'unit':   PatternUnit(NOUN),
+        'word':   PatternWord('в'),
+        'lexeme': PatternLexeme('стол'),
+        'any':    PatternAny(ADJF, NOUN, VERB),
+        'all':    PatternAll(NOUN, gent),
+        'seq':    PatternSeq(ADJF, NOUN),
+        'repeat': PatternRepeat(PatternAny(ADJF, NOUN))[1:],
+        'maybe':  PatternSeq(PatternMaybe(ADJF), NOUN),
+        'same':   PatternSame([GNdr, NMbr, CAse], PatternSeq(PatternRepeat(ADJF), NOUN)),
+        'named':  PatternNamed('obj', PatternSeq(ADJF, NOUN)),
+    }
+    for name, pattern in patterns.items():
+        cases['pattern.' + name + '.short'] = lambda pattern = pattern: pattern.findall(short)
+        cases['pattern.' + name + '.long'] = lambda pattern = pattern: pattern.findall(long)
+
+    # Вложенные повторы на неоднозначных словах: перебор с возвратами растёт экспоненциально.
+    nested = PatternSeq(PatternRepeat(PatternAny(ADJF, PatternUnit(ANY))), PatternWord('конец'))
+    ambiguous = Seq(' '.join(['зеленый'] * 12))
+    cases['pathological.nested_repeat'] = lambda: nested.match(ambiguous)
+    cases['pathological.nested_repeat_packrat'] = lambda: nested.match(ambiguous, packrat = True)
+    possessive = PatternSeq(PatternRepeat(PatternAny(ADJF, PatternUnit(ANY)), mode = POSSESSIVE), PatternWord('конец'))
+    cases['pathological.nested_repeat_possessive'] = lambda: possessive.match(ambiguous)
+
+    # Весь текст одним предложением: глубокий перебор повтора идёт на явном стеке (см. iterative).
+    paragraph = Seq(' '.join(texts))
+    spanning  = PatternSeq(PatternRepeat(ANY), PatternWord('конец'))
+    cases['pathological.paragraph_repeat'] = lambda: spanning.match(paragraph)
+
+    cases['corpus.findall'] = lambda: [patterns['same'].findall(seq) for seq in seqs]
+
+    rules     = [dsl.build(rule) for rule in RULES]
+    optimized = [optimize(rule) for rule in rules]
+    cases['corpus.rules'] = lambda: [rule.findall(seq) for rule in rules for seq in seqs]
+    cases['corpus.rules_optimized'] = lambda: [rule.findall(seq) for rule in optimized for seq in seqs]
+
+    cases['dsl.compile'] = lambda: [dsl.build(rule) for rule in RULES]
+
+    return cases
+
+
+def measure(fn, repeat, min_time):
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops): fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time: break
+        loops *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    timings = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops): fn()
+        timings.append((time.perf_counter() - start) / loops)
+    return {'best': min(timings), 'median': statistics.median(timings), 'loops': loops}
+
+
+def run(pattern = None, repeat = 5, min_time = 0.2, out = sys.stdout):
+    warmup()
+    results = {}
+    for name, fn in benchmarks(load_sample()).items():
+        if pattern and not re.search(pattern, name): continue
+        result = measure(fn, repeat, min_time)
+        results[name] = result
+        print('%-40s %12.1f us %12.1f us  x%d' % (name, result['best'] * 1e6, result['median'] * 1e6, result['loops']), file = out)
+    return {
+        'python':   platform.python_version(),
+        'platform': platform.platform(),
+        'results':  results,
+    }
+
+
+# Сравнивает лучшее время замеров с базовыми; возвращает имена замеров, замедлившихся больше чем на max_slowdown процентов.
+def compare(current, baseline, max_slowdown = 10.0, out = sys.stdout):
+    slower = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print('%-40s %12s' % (name, 'new'), file = out)
+            continue
+        change = (result['best'] / base['best'] - 1) * 100 if base['best'] else 0.0
+        flag   = ''
+        if change > max_slowdown:
+            flag = '  SLOWER'
+            slower.append(name)
+        print('%-40s %12.1f us -> %12.1f us %+7.1f%%%s' % (name, base['best'] * 1e6, result['best'] * 1e6, change, flag), file = out)
+    return slower
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'polymorphy benchmarks')
+    parser.add_argument('-k', dest = 'pattern', help = 'run benchmarks whose names match the regular expression')
+    parser.add_argument('--repeat', type = int, default = 5)
+    parser.add_argument('--min-time', type = float, default = 0.2, help = 'seconds per measurement')
+    parser.add_argument('--json', help = 'write results to the file')
+    parser.add_argument('--baseline', help = 'compare with results saved by --json')
+    parser.add_argument('--max', type = float, default = 10.0, help = 'allowed slowdown against the baseline, percent')
+    args = parser.parse_args(argv)
+
+    current = run(args.pattern, args.repeat, args.min_time)
+    if args.json:
+        with open(args.json, 'w') as file: json.dump(current, file, indent = 2, sort_keys = True)
+    if args.baseline:
+        with open(args.baseline, 'r') as file: baseline = json.load(file)
+        print()
+        slower = compare(current, baseline, args.max)
+        if slower: return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,3 +3,17 @@ from .word import Word
 from .dsl import pattern
 
 __all__ = ['constants', 'word', 'seq', 'patterns', 'dsl']
+
+
+# Заранее загружает словари анализатора, таблицу граммем и парсер DSL, которые иначе создаются
+# при первом использовании. Вызывается, например, перед fork в серверах с пулом процессов,
+# чтобы процессы разделяли загруженные страницы. morph - свой или общий экземпляр pymorphy2.MorphAnalyzer,
+# backend - общий анализатор (см. backend).
+def warmup(morph = None, backend = None):
+    from .masks import grammemes
+    from .dsl import parser
+    if morph is not None: Word.set_morph(morph)
+    if backend is not None: Word.set_backend(backend)
+    Word.default_backend().warmup()
+    grammemes()
+    parser.get()
@@ -0,0 +1,82 @@
+from abc import ABC, abstractmethod
+
+
+# Морфологический анализатор, которым пользуются Word и Seq.
+#
+# Вариант разбора - объект с полями word, tag, normal_form и score, как pymorphy2 Parse;
+# tag - тег pymorphy2 (OpencorporaTag) или объект с тем же набором граммем grammemes.
+# Бэкенд выбирается глобально (Word.set_backend) или для отдельного предложения (Seq(..., backend = ...)).
+# Обязателен только parse: бэкенд без него не создаётся. Остальные методы имеют разумные значения по умолчанию.
+# Бэкенд сериализуется вместе со словами (см. Word.__reduce__), поэтому он должен поддерживать pickle.
+class Backend(ABC):
+    __slots__ = tuple()
+
+    @abstractmethod
+    def parse(self, text):
+        pass
+
+    # Разбор нескольких строк за раз; бэкенды, которым выгоден пакетный разбор, переопределяют его.
+    def parse_many(self, texts):
+        return [self.parse(text) for text in texts]
+
+    # Вариант, склонённый по граммемам, или None.
+    def inflect(self, variant, grammemes):
+        return variant.inflect(grammemes)
+
+    # Варианты всех форм лексемы варианта.
+    def lexeme(self, variant):
+        return variant.lexeme
+
+    # Есть ли строка в словаре бэкенда. Без словаря - нет: нормальная форма любого слова может быть любой.
+    def word_is_known(self, text):
+        return False
+
+    # Все граммемы бэкенда (см. masks).
+    def grammemes(self):
+        return []
+
+    # Загружает словари заранее (см. polymorphy.warmup).
+    def warmup(self):
+        pass
+
+
+# pymorphy2.MorphAnalyzer, который создаётся при первом разборе, или переданный готовый экземпляр.
+class Pymorphy2Backend(Backend):
+    __slots__ = ('__morph',)
+
+    __shared = None
+
+    def __init__(self, morph = None):
+        self.__morph = morph
+
+    # Анализатор не сериализуется: в процессе-получателе слова разбирает общий экземпляр (см. shared).
+    def __reduce__(self):
+        return (Pymorphy2Backend.shared, ())
+
+    # Общий бэкенд pymorphy2 процесса: общий анализатор Word, если это pymorphy2, иначе свой единственный экземпляр.
+    @staticmethod
+    def shared():
+        from .word import Word
+        backend = Word.default_backend()
+        if isinstance(backend, Pymorphy2Backend): return backend
+        if Pymorphy2Backend.__shared is None: Pymorphy2Backend.__shared = Pymorphy2Backend()
+        return Pymorphy2Backend.__shared
+
+    @property
+    def morph(self):
+        if self.__morph is None:
+            import pymorphy2
+            self.__morph = pymorphy2.MorphAnalyzer()
+        return self.__morph
+
+    def parse(self, text):
+        return self.morph.parse(text)
+
+    def word_is_known(self, text):
+        return self.morph.word_is_known(text)
+
+    def grammemes(self):
+        return list(self.morph.TagClass.KNOWN_GRAMMEMES)
+
+    def warmup(self):
+        self.morph
@@ -0,0 +1,60 @@
+from collections import OrderedDict, namedtuple
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+# Кэш ограниченного размера: при переполнении вытесняются давно не использованные записи (LRU).
+# maxsize = None - кэш не ограничен, maxsize = 0 - кэш выключен.
+class LRUCache(object):
+    __slots__ = ('maxsize', 'hits', 'misses', '__data')
+
+    def __init__(self, maxsize = 1024):
+        self.maxsize = maxsize
+        self.hits    = 0
+        self.misses  = 0
+        self.__data  = OrderedDict()
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __contains__(self, key):
+        return key in self.__data
+
+    def __iter__(self):
+        return iter(list(self.__data.items()))
+
+    # Возвращает значение по ключу или default, если ключа нет; учитывает попадания и промахи.
+    def get(self, key, default = None):
+        data = self.__data
+        if key in data:
+            data.move_to_end(key)
+            self.hits += 1
+            return data[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        if self.maxsize == 0: return
+        data = self.__data
+        data[key] = value
+        data.move_to_end(key)
+        self.__evict()
+
+    # Меняет размер кэша, при уменьшении вытесняет лишние записи.
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        self.__evict()
+
+    def clear(self):
+        self.__data.clear()
+        self.hits   = 0
+        self.misses = 0
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.__data))
+
+    def __evict(self):
+        if self.maxsize is None: return
+        data = self.__data
+        while len(data) > self.maxsize: data.popitem(last = False)
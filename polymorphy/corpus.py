@@ -0,0 +1,67 @@
+import os
+from collections import deque
+from multiprocessing import Pool
+from . import warmup
+from .seq import Seq
+
+
+# Шаблон, порог и вид результата рабочего процесса, задаются один раз при старте процесса.
+_pattern   = None
+_threshold = 0
+_matches   = False
+
+
+# Словари загружаются при старте процесса; при fork они уже загружены родителем (см. match_corpus).
+def _init_worker(pattern, threshold, matches):
+    global _pattern, _threshold, _matches
+    _pattern   = pattern
+    _threshold = threshold
+    _matches   = matches
+    warmup()
+
+
+# Совпадения или их границы для каждого текста пачки.
+def _match_chunk(texts):
+    return [_result(_pattern.finditer(seq), _matches) for seq in Seq.batch(texts, _threshold)]
+
+
+def _result(found, matches):
+    if matches: return list(found)
+    return [(m.start, m.end) for m in found]
+
+
+def _chunks(texts, chunksize):
+    chunk = []
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) >= chunksize:
+            yield chunk
+            chunk = []
+    if chunk: yield chunk
+
+
+# Ищет шаблон во всех текстах корпуса с помощью пула процессов.
+# Для каждого текста в порядке входа возвращает список непересекающихся совпадений:
+# по умолчанию - их границы (start, end), при matches = True - сами объекты Match с группами.
+# Границы дешевле: Match передаётся со словами и их вариантами, и при распаковке
+# каждое слово снова разбирается в родительском процессе (см. Word.restore).
+# Шаблон передаётся в каждый процесс один раз, тексты читаются потоком пачками по chunksize,
+# и в работе одновременно находится не больше 2 * workers пачек.
+# При workers = 1 поиск выполняется в текущем процессе.
+def match_corpus(pattern, texts, workers = None, chunksize = 256, threshold = 0, matches = False):
+    if workers is None: workers = os.cpu_count() or 1
+
+    if workers == 1:
+        for seq in Seq.iter_from(texts, threshold, chunksize):
+            yield _result(pattern.finditer(seq), matches)
+        return
+
+    warmup()
+    with Pool(workers, initializer = _init_worker, initargs = (pattern, threshold, matches)) as pool:
+        pending = deque()
+        for chunk in _chunks(texts, chunksize):
+            pending.append(pool.apply_async(_match_chunk, (chunk,)))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
@@ -1,12 +1,38 @@
 import os
-from lark import Lark, Transformer
+import sys
+import pickle
+from lark import Lark, Transformer, Tree
+from . import optimize as optimizer
+from .cache import LRUCache
 from .patterns import *
 
 
-with open(os.path.dirname(__file__) + '/dsl.ebnf', 'r') as file:
-    grammar = file.read()
+# Парсер DSL. Грамматика читается и Lark строится при первом разборе, а не при импорте.
+# Узлы дерева разбора хранят позиции в тексте (meta.start_pos, meta.end_pos), см. Source.
+class LazyParser(object):
+    __slots__ = ('path', '__parser')
 
-parser = Lark(grammar, start = 'root')
+    def __init__(self, path):
+        self.path     = path
+        self.__parser = None
+
+    def get(self):
+        if self.__parser is None:
+            with open(self.path, 'r') as file:
+                self.__parser = Lark(file.read(), start = 'root', propagate_positions = True)
+        return self.__parser
+
+    def parse(self, text):
+        return self.get().parse(text)
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+parser = LazyParser(os.path.dirname(__file__) + '/dsl.ebnf')
+
+# Кэш построенных шаблонов по тексту DSL, по аналогии с внутренним кэшем модуля re.
+cache = LRUCache(512)
 
 
 class PatternTransformer(Transformer):
@@ -41,12 +67,15 @@ class PatternTransformer(Transformer):
         params = dict(items)
         r_min  = params['r_min'] if 'r_min' in params else 0
         r_max  = params['r_max'] if 'r_max' in params else None
+        r_mode = params['r_mode'] if 'r_mode' in params else GREEDY
         nested = params['nested_pattern'][0]
-        return PatternRepeat(nested, min = r_min, max = r_max)
+        return PatternRepeat(nested, min = r_min, max = r_max, mode = r_mode)
 
     def pattern_maybe(self, items):
-        nested = items[0][1][0]
-        return PatternMaybe(nested)
+        params = dict(items)
+        r_mode = params['r_mode'] if 'r_mode' in params else GREEDY
+        nested = params['nested_pattern'][0]
+        return PatternMaybe(nested, mode = r_mode)
 
     def pattern_same(self, items):
         grms   = [token.value for token in items[:-1]]
@@ -70,6 +99,9 @@ class PatternTransformer(Transformer):
     def r_min(self, items):
         return ('r_min', int(items[0].value))
 
+    def r_mode(self, items):
+        return ('r_mode', items[0].value)
+
     def fragment_ref(self, items):
         name = items[0].value
         if not name in self._fragments: raise Exception('Unknown fragment ' + name)
@@ -83,7 +115,8 @@ class FragmentDefinitionTransformer(PatternTransformer):
         return (name, pattern)
 
 
-def pattern(text):
+# Строит дерево шаблонов по тексту DSL, минуя кэш.
+def build(text):
     root_tree      = parser.parse(text)
     pattern_tree   = root_tree.children[0]
     fragment_trees = root_tree.children[1:]
@@ -98,3 +131,102 @@ def pattern(text):
     result      = transformer.transform(pattern_tree)
 
     return result
+
+
+# Возвращает шаблон для текста DSL; повторный вызов с тем же текстом не запускает парсер.
+# Шаблоны из кэша общие для всех вызывающих, изменять их нельзя.
+# optimize = True - дерево упрощается (см. optimize); упрощённые шаблоны кэшируются отдельно.
+def compile_pattern(text, optimize = False):
+    key    = (text, True) if optimize else text
+    result = cache.get(key)
+    if result is None:
+        result = optimizer.optimize(build(text)) if optimize else build(text)
+        cache.put(key, result)
+    return result
+
+
+def pattern(text, optimize = False):
+    return compile_pattern(text, optimize)
+
+
+# Правило DSL с позициями узлов в тексте: для каждого узла шаблона - границы фрагмента правила,
+# из которого он построен (для отчётов профилирования, см. profiler).
+# pattern - шаблон из кэша compile_pattern или любой шаблон, построенный по тому же тексту.
+# Узлы фрагментов (@name) отмечаются текстом определения фрагмента.
+class Source(object):
+    __slots__ = ('text', 'pattern', 'spans')
+
+    def __init__(self, text, pattern = None):
+        self.text    = text
+        self.pattern = pattern if pattern is not None else compile_pattern(text)
+        self.spans   = {}
+
+        root_tree = parser.parse(text)
+        fragments = dict((tree.children[0].value, tree.children[1]) for tree in root_tree.children[1:])
+        self.walk(root_tree.children[0], self.pattern, fragments)
+
+    # Фрагмент текста правила, из которого построен узел, или None для узлов не из правила.
+    def span(self, pattern):
+        return self.spans.get(id(pattern))
+
+    def snippet(self, pattern, width = 60):
+        span = self.span(pattern)
+        if span is None: return None
+        text = ' '.join(self.text[span[0]:span[1]].split())
+        return text if len(text) <= width else text[:width - 3] + '...'
+
+    # Обходит дерево разбора и дерево шаблона параллельно: вложенные шаблоны узла идут в порядке записи.
+    def walk(self, tree, pattern, fragments):
+        if id(pattern) in self.spans: return
+        if tree.data == 'fragment_ref': tree = fragments[tree.children[0].value]
+        self.spans[id(pattern)] = (tree.meta.start_pos, tree.meta.end_pos)
+        subtrees = []
+        for child in tree.children:
+            if not isinstance(child, Tree) or child.data in ('r_min', 'r_max', 'r_mode'): continue
+            if child.data in ('nested_pattern', 'nested_patterns'): subtrees.extend(child.children)
+            else: subtrees.append(child)
+        if hasattr(pattern, 'parts'): subpatterns = pattern.parts
+        elif hasattr(pattern, 'patterns'): subpatterns = pattern.patterns
+        elif hasattr(pattern, 'sub'): subpatterns = [pattern.sub]
+        else: subpatterns = []
+        if len(subtrees) != len(subpatterns): return
+        for subtree, subpattern in zip(subtrees, subpatterns): self.walk(subtree, subpattern, fragments)
+
+
+def source(text):
+    return Source(text)
+
+
+def purge():
+    cache.clear()
+
+
+# Сохраняет содержимое кэша в файл, чтобы при старте процесса не разбирать правила заново.
+def dump_cache(path):
+    with open(path, 'wb') as file:
+        pickle.dump(dict(cache), file, protocol = pickle.HIGHEST_PROTOCOL)
+
+
+# Распаковщик файла кэша: из глобальных имён разрешены только классы шаблонов.
+class CacheUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if module == PatternAbstract.__module__:
+            cls = getattr(sys.modules[module], name, None)
+            if isinstance(cls, type) and issubclass(cls, PatternAbstract): return cls
+        raise pickle.UnpicklingError('Forbidden global in pattern cache: ' + module + '.' + name)
+
+
+# Загружает шаблоны, сохранённые dump_cache; возвращает число загруженных шаблонов.
+# Файл кэша - pickle: загружайте только файлы, созданные своим процессом или из доверенного источника.
+# Распаковщик допускает только классы шаблонов, а содержимое проверяется до того, как попасть в кэш:
+# ключ - текст правила (или пара (текст, True) для упрощённых шаблонов), значение - шаблон.
+def load_cache(path):
+    with open(path, 'rb') as file:
+        patterns = CacheUnpickler(file).load()
+    if type(patterns) != dict: raise ValueError('Not a pattern cache: ' + path)
+    for key, result in patterns.items():
+        text = key[0] if type(key) == tuple and len(key) == 2 and key[1] is True else key
+        if type(text) != str or not isinstance(result, PatternAbstract):
+            raise ValueError('Not a pattern cache: ' + path)
+    for key, result in patterns.items(): cache.put(key, result)
+    return len(patterns)
@@ -0,0 +1,149 @@
+import pickle
+from .seq import Seq
+from .masks import mask_grammemes
+from .patterns import PatternUnit, PatternUnits, PatternWord, PatternLexeme, PatternAny, PatternAll, \
+    PatternSeq, PatternRepeat, PatternSame, PatternNamed
+from .prefilter import WORD, LEXEME, GRAMMEME, first, required
+
+
+# Инвертированный индекс разобранного корпуса: для каждого атома (словоформа, нормальная форма,
+# граммема; см. prefilter) - предложения и номера слов, на которых он выполняется.
+# Поиск шаблона сначала отбирает по индексу предложения-кандидаты (см. Query),
+# и только в них запускает полное сопоставление.
+class CorpusIndex(object):
+    __slots__ = ('texts', 'threshold', 'postings')
+
+    def __init__(self, texts = (), threshold = 0):
+        self.texts     = []
+        self.threshold = threshold
+        self.postings  = {}
+        self.add(texts)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, texts):
+        for seq in Seq.iter_from(texts, self.threshold):
+            sentence = len(self.texts)
+            self.texts.append(seq.text)
+            for offset, word in enumerate(seq):
+                for atom in CorpusIndex.atoms(word):
+                    self.postings.setdefault(atom, {}).setdefault(sentence, []).append(offset)
+
+    # Атомы, которые выполняются на слове.
+    @staticmethod
+    def atoms(word):
+        atoms = set([(WORD, word.text)])
+        mask  = 0
+        for variant, variant_mask in zip(word.variants, word.masks):
+            atoms.add((LEXEME, variant.normal_form))
+            mask |= variant_mask
+        for grammeme in mask_grammemes(mask): atoms.add((GRAMMEME, grammeme))
+        return atoms
+
+    # Предложения, в которых выполняется атом: номер предложения -> номера слов.
+    def sentences(self, atom):
+        return self.postings.get(atom, {})
+
+    def seq(self, sentence):
+        return Seq(self.texts[sentence], self.threshold)
+
+    # Номера предложений, в которых шаблон может найтись, по возрастанию.
+    def candidates(self, pattern):
+        return Query(pattern).candidates(self)
+
+    # Пары (номер предложения, совпадение) для всех предложений-кандидатов.
+    def finditer(self, pattern, packrat = False, steps = None, timeout = None):
+        for sentence in self.candidates(pattern):
+            for match in pattern.finditer(self.seq(sentence), packrat, steps, timeout):
+                yield sentence, match
+
+    def findall(self, pattern, packrat = False, steps = None, timeout = None):
+        return list(self.finditer(pattern, packrat, steps, timeout))
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            pickle.dump((self.texts, self.threshold, self.postings), file, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as file:
+            texts, threshold, postings = pickle.load(file)
+        index = CorpusIndex.__new__(CorpusIndex)
+        index.texts     = texts
+        index.threshold = threshold
+        index.postings  = postings
+        return index
+
+
+# План запроса по статической структуре шаблона.
+# clauses - обязательные условия на предложение (prefilter.required с граммемами):
+# пересекаются объединения списков предложений атомов каждого условия.
+# phrases - цепочки однословных шаблонов подряд в PatternSeq: условия на соседние слова
+# (None - любое слово), которые проверяются по номерам слов.
+class Query(object):
+    __slots__ = ('pattern', 'clauses', 'phrases')
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.clauses = required(pattern, grammemes = True)
+        self.phrases = Query.find_phrases(pattern)
+
+    def candidates(self, index):
+        found   = None
+        clauses = sorted(self.clauses, key = lambda c: sum(len(index.sentences(a)) for a in c))
+        for clause in clauses:
+            sentences = set()
+            for atom in clause: sentences.update(index.sentences(atom))
+            found = sentences if found is None else found & sentences
+            if not found: return []
+        if found is None: found = range(len(index))
+        return sorted(s for s in found if all(Query.aligned(index, s, phrase) for phrase in self.phrases))
+
+    # Есть ли в предложении позиция, с которой выполняются все условия цепочки.
+    @staticmethod
+    def aligned(index, sentence, phrase):
+        starts = None
+        for shift, atoms in enumerate(phrase):
+            if atoms is None: continue
+            offsets = set()
+            for atom in atoms: offsets.update(o - shift for o in index.sentences(atom).get(sentence, ()))
+            starts = offsets if starts is None else starts & offsets
+            if not starts: return False
+        return True
+
+    @staticmethod
+    def find_phrases(pattern):
+        if isinstance(pattern, PatternSeq):
+            phrases = []
+            run     = []
+            for part in pattern.parts:
+                if Query.one_word(part):
+                    run.append(first(part, grammemes = True))
+                    continue
+                Query.flush(run, phrases)
+                run = []
+                phrases.extend(Query.find_phrases(part))
+            Query.flush(run, phrases)
+            return phrases
+        if isinstance(pattern, PatternAll):
+            return [phrase for p in pattern.patterns for phrase in Query.find_phrases(p)]
+        if isinstance(pattern, PatternRepeat):
+            if pattern.min_repeats == 0 or pattern.max_repeats == 0: return []
+            return Query.find_phrases(pattern.sub)
+        if isinstance(pattern, (PatternSame, PatternNamed)): return Query.find_phrases(pattern.sub)
+        return []
+
+    @staticmethod
+    def flush(run, phrases):
+        while run and run[-1] is None: run.pop()
+        while run and run[0] is None: run.pop(0)
+        if sum(atoms is not None for atoms in run) > 1: phrases.append(run)
+
+    # Совпадает ли шаблон всегда ровно с одним словом.
+    @staticmethod
+    def one_word(pattern):
+        if isinstance(pattern, (PatternUnit, PatternUnits, PatternWord, PatternLexeme)): return True
+        if isinstance(pattern, (PatternAny, PatternAll)): return all(Query.one_word(p) for p in pattern.patterns)
+        if isinstance(pattern, (PatternSame, PatternNamed)): return Query.one_word(pattern.sub)
+        return False
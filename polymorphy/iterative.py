@@ -0,0 +1,446 @@
+from .seq import Seq
+from .patterns import LAZY, POSSESSIVE, Match, MemoEntry, PatternUnit, PatternUnits, PatternWord, PatternLexeme, PatternAny, PatternAll, \
+    PatternSeq, PatternRepeat, PatternMaybe, PatternSame, PatternNamed
+
+
+# Сопоставление без рекурсии: перебор match_gen, записанный как автомат над явным стеком кадров.
+#
+# Каждый генератор match_gen заменяется кадром - объектом с номером состояния, в котором перебор
+# остановился. Шаг кадра (step) получает совпадение от вложенного кадра (или None, если тот
+# исчерпан или если кадр только начал работу либо продолжает после своего совпадения) и возвращает:
+#   Frame - вложенный кадр, который нужно продвинуть (новый или уже работавший);
+#   Match - очередное совпадение кадра, которое получает родитель;
+#   None  - перебор кадра закончен.
+# Кадры вызываются только из цикла iterate, поэтому глубина стека Python не зависит от длины
+# предложения и числа повторов, а стек кадров - обычный список.
+#
+# Порядок совпадений тот же, что у match_gen, шаг за шагом: первое совпадение, все совпадения
+# и расход бюджета шагов (см. patterns.MatchBudget) одинаковы. Режимы контекста (patterns.MatchContext)
+# тоже повторяют перебор генераторами: при packrat кадр узла закрывается кадром памяти (MemoFrame),
+# с профилем - кадром профиля (ProfileFrame), как генератор узла в MatchContext.gen.
+# Пользовательские подклассы перебираются своим match_gen внутри кадра-обёртки.
+#
+# Кадр на Python медленнее генератора, поэтому явный стек включается только для длинных
+# предложений (см. PatternAbstract.iterative_from). Однословные шаблоны вычисляются сразу,
+# без своего кадра: вложенный "кадр" такого шаблона - его единственное совпадение или None,
+# а исчерпанный однословный шаблон отмечается как None.
+
+START, NEXT, HEAD, TAIL, RESUME_HEAD, RESUME_TAIL, EMPTY = range(7)
+
+
+def iterate(pattern, seq, ctx = None):
+    budget = ctx.budget if ctx is not None and ctx.memo is None and ctx.profile is None else None
+    root   = enter(pattern, seq, 0, ctx)
+    if not isinstance(root, Frame):
+        if root is not None: yield root
+        return
+    stack    = [root]
+    received = None
+    while True:
+        current = stack[-1]
+        out     = current.step(received)
+        if out is None:
+            stack.pop()
+            if not stack: return
+            received = None
+        elif type(out) is Match:
+            if budget is not None: budget.step(current.pattern)
+            stack.pop()
+            if stack:
+                received = out
+            else:
+                yield out
+                stack.append(root)
+                received = None
+        else:
+            stack.append(out)
+            received = None
+
+
+# Вход в узел: новый кадр или, для однословного шаблона, его совпадение (None - совпадения нет).
+# Вход и совпадение - шаги бюджета, как в MatchContext.guard.
+def enter(pattern, seq, lvl, ctx):
+    if ctx is not None:
+        if ctx.budget is not None: ctx.budget.step(pattern)
+        if ctx.memo is not None or ctx.profile is not None: return wrap(pattern, seq, lvl, ctx)
+    cls = FRAMES.get(type(pattern), GenFrame)
+    if cls is not None: return cls(pattern, seq, lvl, ctx)
+    match = next(pattern.match_gen(seq, lvl), None)
+    if match is not None and ctx is not None and ctx.budget is not None: ctx.budget.step(pattern)
+    return match
+
+
+# Вход в узел при packrat или с профилем. Совпадения узла в бюджете учитывает верхний кадр-обёртка,
+# а не цикл iterate. Записи памяти кадров хранятся под своими ключами (первый элемент - Frame):
+# запись генератора (MemoEntry.replay) кадр продвинуть не может, и наоборот.
+# Однословные шаблоны не запоминаются: их совпадение вычисляется дешевле, чем читается из памяти.
+def wrap(pattern, seq, lvl, ctx):
+    cls     = FRAMES.get(type(pattern), GenFrame)
+    profile = ctx.profile
+    if cls is None:
+        if profile is None:
+            match = next(pattern.match_gen(seq, lvl), None)
+            if match is not None and ctx.budget is not None: ctx.budget.step(pattern)
+            return match
+        frame = UnitFrame(pattern, seq, lvl, ctx)
+    elif ctx.memo is None:
+        frame = cls(pattern, seq, lvl, ctx)
+    else:
+        key   = (Frame, id(pattern), seq.key, ctx.distinct)
+        entry = ctx.memo.get(key)
+        if entry is None:
+            entry = MemoEntry(pattern, seq, cls(pattern, seq, lvl, ctx), ctx.distinct)
+            ctx.memo[key] = entry
+        frame        = MemoFrame(pattern, seq, lvl, ctx)
+        frame.entry  = entry
+        frame.index  = 0
+        frame.budget = ctx.budget if profile is None else None
+    if profile is None: return frame
+    outer       = ProfileFrame(pattern, seq, lvl, ctx)
+    outer.inner = frame
+    return outer
+
+
+class Frame(object):
+    __slots__ = ('pattern', 'seq', 'lvl', 'ctx', 'state')
+
+    def __init__(self, pattern, seq, lvl, ctx):
+        self.pattern = pattern
+        self.seq     = seq
+        self.lvl     = lvl
+        self.ctx     = ctx
+        self.state   = START
+
+
+# Пользовательский шаблон: его match_gen в том же контексте.
+class GenFrame(Frame):
+    __slots__ = ('gen',)
+
+    def step(self, received):
+        if self.state == START:
+            self.state = NEXT
+            self.gen   = self.pattern.match_gen(self.seq, self.lvl, self.ctx)
+        return next(self.gen, None)
+
+
+# Однословный шаблон под кадром профиля: единственное совпадение, затем конец перебора.
+class UnitFrame(Frame):
+    __slots__ = ()
+
+    def step(self, received):
+        if self.state != START: return None
+        self.state = EMPTY
+        return next(self.pattern.match_gen(self.seq, self.lvl), None)
+
+
+# Узел при packrat: совпадения читаются из записи памяти, а кадр узла (entry.gen) продвигается,
+# только когда записанные совпадения кончились, - как в MemoEntry.replay. Пока кадр узла работает
+# (running), повторный вход видит только уже найденное. При distinct совпадения уже найденной длины
+# пропускаются.
+class MemoFrame(Frame):
+    __slots__ = ('entry', 'index', 'budget')
+
+    def step(self, received):
+        entry = self.entry
+        if self.state == HEAD:
+            entry.running = False
+            if received is None:
+                entry.gen = None
+            else:
+                lengths = entry.lengths
+                if lengths is not None:
+                    length = received.end - received.start
+                    if length in lengths:
+                        entry.running = True
+                        return entry.gen
+                    lengths.add(length)
+                entry.matches.append(received)
+        matches = entry.matches
+        if self.index < len(matches):
+            match       = matches[self.index]
+            self.index += 1
+            self.state  = NEXT
+            if self.budget is not None: self.budget.step(self.pattern)
+            return match
+        if entry.gen is None or entry.running: return None
+        entry.running = True
+        self.state    = HEAD
+        return entry.gen
+
+
+# Узел с профилем: каждый шаг вложенного кадра (inner) измеряется, как шаг генератора в Profile.wrap.
+# Кадры стоят на стеке один над другим, поэтому шаги вложенных узлов вкладываются в шаг этого узла.
+class ProfileFrame(Frame):
+    __slots__ = ('inner', 'stats', 'started', 'found')
+
+    def step(self, received):
+        profile = self.ctx.profile
+        state   = self.state
+        if state == HEAD:
+            profile.suspend(self.stats, self.started)
+            if received is None:
+                profile.leave(self.stats, self.lvl, self.seq, self.found)
+                self.state = EMPTY
+                return None
+            if self.ctx.budget is not None: self.ctx.budget.step(self.pattern)
+            self.found += 1
+            profile.matched(self.stats, self.lvl, self.seq, received)
+            self.state  = NEXT
+            return received
+        if state == EMPTY: return None
+        if state == START:
+            self.stats = profile.enter(self.pattern, self.seq, self.lvl)
+            self.found = 0
+        else:
+            profile.redo(self.stats, self.lvl, self.seq)
+        self.started = profile.resume(self.stats)
+        self.state   = HEAD
+        return self.inner
+
+
+class AnyFrame(Frame):
+    __slots__ = ('index', 'child')
+
+    def step(self, received):
+        state = self.state
+        while True:
+            if state == HEAD:
+                if received is not None:
+                    self.state = RESUME_HEAD
+                    return received
+                self.index += 1
+                if self.index == len(self.pattern.patterns): return None
+            elif state == RESUME_HEAD:
+                if self.child is not None:
+                    self.state = HEAD
+                    return self.child
+                state = HEAD
+                continue
+            else:
+                if len(self.seq) < self.pattern.min: return None
+                self.index = 0
+            child = enter(self.pattern.patterns[self.index], self.seq, self.lvl + 1, self.ctx)
+            state = HEAD
+            if isinstance(child, Frame):
+                self.child = child
+                self.state = HEAD
+                return child
+            self.child = None
+            received   = child
+
+
+class SeqFrame(Frame):
+    __slots__ = ('head', 'tail', 'match')
+
+    exact = False
+
+    def step(self, received):
+        state = self.state
+        while True:
+            if state == HEAD:
+                if received is None: return None
+                rest = self.pattern.rest
+                if rest is None:
+                    self.state = RESUME_HEAD
+                    return received
+                self.match = received
+                tail = enter(rest, self.rest_seq(received), self.lvl + 1, self.ctx)
+                if isinstance(tail, Frame):
+                    self.tail  = tail
+                    self.state = TAIL
+                    return tail
+                self.tail = None
+                received  = tail
+                state     = TAIL
+            elif state == TAIL:
+                if received is not None:
+                    self.state = RESUME_TAIL
+                    return self.join(received)
+                state = RESUME_HEAD
+            elif state == RESUME_HEAD:
+                if self.head is not None:
+                    self.state = HEAD
+                    return self.head
+                received = None
+                state    = HEAD
+            elif state == RESUME_TAIL:
+                if self.tail is not None:
+                    self.state = TAIL
+                    return self.tail
+                received = None
+                state    = TAIL
+            else:
+                if len(self.seq) < self.pattern.min: return None
+                ctx  = self.ctx
+                if self.exact and ctx is not None: ctx = ctx.exact()
+                head = enter(self.pattern.first, self.seq, self.lvl + 1, ctx)
+                if isinstance(head, Frame):
+                    self.head  = head
+                    self.state = HEAD
+                    return head
+                self.head = None
+                received  = head
+                state     = HEAD
+
+    def rest_seq(self, match):
+        return self.seq[match.end - match.start:]
+
+    def join(self, match):
+        return self.match + match
+
+
+# PatternAll: rest сопоставляется с найденным first, а группы объединяются.
+# first перебирается в точном режиме контекста (см. MatchContext.exact).
+class AllFrame(SeqFrame):
+    __slots__ = ()
+
+    exact = True
+
+    def rest_seq(self, match):
+        return match.seq
+
+    def join(self, match):
+        return Match(match.seq, Match.merge_groups(self.match.groups, match.groups))
+
+
+class RepeatFrame(Frame):
+    __slots__ = ('head', 'tail', 'match')
+
+    def step(self, received):
+        state   = self.state
+        pattern = self.pattern
+        while True:
+            if state == HEAD:
+                if received is None:
+                    if pattern.min_repeats != 0 or pattern.mode == LAZY: return None
+                    self.state = EMPTY
+                    return Match(Seq())
+                seq  = self.seq
+                size = received.end - received.start
+                should_try_more = \
+                    len(seq) > size \
+                    and (len(seq) - size >= pattern.min - pattern.sub.min) \
+                    and (pattern.max_repeats is None or pattern.max_repeats > 1)
+                if should_try_more:
+                    self.match = received
+                    tail = enter(pattern.rest, seq[received.end - received.start:], self.lvl + 1, self.ctx)
+                    if isinstance(tail, Frame):
+                        self.tail  = tail
+                        self.state = TAIL
+                        return tail
+                    self.tail = None
+                    received  = tail
+                    state     = TAIL
+                elif pattern.min_repeats > 1:
+                    state = RESUME_HEAD
+                else:
+                    self.state = EMPTY if pattern.mode == POSSESSIVE else RESUME_HEAD
+                    return received
+            elif state == TAIL:
+                if received is not None:
+                    self.state = EMPTY if pattern.mode == POSSESSIVE else RESUME_TAIL
+                    return self.match + received
+                state = RESUME_HEAD
+            elif state == RESUME_HEAD:
+                if self.head is not None:
+                    self.state = HEAD
+                    return self.head
+                received = None
+                state    = HEAD
+            elif state == RESUME_TAIL:
+                if self.tail is not None:
+                    self.state = TAIL
+                    return self.tail
+                received = None
+                state    = TAIL
+            elif state == EMPTY:
+                return None
+            else:
+                if state == START:
+                    if len(self.seq) < pattern.min or pattern.max_repeats == 0: return None
+                    if pattern.mode == LAZY and pattern.min_repeats == 0:
+                        self.state = NEXT
+                        return Match(Seq())
+                head = enter(pattern.sub, self.seq, self.lvl + 1, self.ctx)
+                if isinstance(head, Frame):
+                    self.head  = head
+                    self.state = HEAD
+                    return head
+                self.head = None
+                received  = head
+                state     = HEAD
+
+
+class SameFrame(Frame):
+    __slots__ = ('alternatives', 'child')
+
+    def step(self, received):
+        state = self.state
+        while True:
+            if state == HEAD:
+                if received is not None:
+                    self.state = RESUME_HEAD
+                    return received
+            elif state == RESUME_HEAD:
+                if self.child is not None:
+                    self.state = HEAD
+                    return self.child
+                received = None
+                state    = HEAD
+                continue
+            else:
+                if len(self.seq) < self.pattern.min: return None
+                self.alternatives = self.pattern.constrain_same(self.seq, self.lvl)
+            constrained = next(self.alternatives, None)
+            if constrained is None: return None
+            child = enter(self.pattern.sub, constrained, self.lvl + 1, self.ctx)
+            state = HEAD
+            if isinstance(child, Frame):
+                self.child = child
+                self.state = HEAD
+                return child
+            self.child = None
+            received   = child
+
+
+class NamedFrame(Frame):
+    __slots__ = ('child',)
+
+    def step(self, received):
+        state = self.state
+        while True:
+            if state == HEAD:
+                if received is None: return None
+                self.state = RESUME_HEAD
+                return Match(received.seq, {self.pattern.name: [received.seq]})
+            elif state == RESUME_HEAD:
+                if self.child is not None:
+                    self.state = HEAD
+                    return self.child
+                received = None
+                state    = HEAD
+            else:
+                child = enter(self.pattern.sub, self.seq, self.lvl + 1, self.ctx)
+                state = HEAD
+                if isinstance(child, Frame):
+                    self.child = child
+                    self.state = HEAD
+                    return child
+                self.child = None
+                received   = child
+
+
+# Кадры узлов; None - однословный шаблон без кадра (см. enter), остальные типы - GenFrame.
+FRAMES = {
+    PatternUnit:   None,
+    PatternUnits:  None,
+    PatternWord:   None,
+    PatternLexeme: None,
+    PatternAny:    AnyFrame,
+    PatternAll:    AllFrame,
+    PatternSeq:    SeqFrame,
+    PatternRepeat: RepeatFrame,
+    PatternMaybe:  RepeatFrame,
+    PatternSame:   SameFrame,
+    PatternNamed:  NamedFrame,
+}
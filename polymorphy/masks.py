@@ -0,0 +1,82 @@
+from .constants import ABSTRACT_GRAMMEMES
+
+
+# Граммемы кодируются битами целого числа, а тег - маской своих граммем,
+# так что проверка "вариант содержит граммему" сводится к побитовому И.
+# Первыми идут значения ABSTRACT_GRAMMEMES в порядке объявления, затем остальные граммемы
+# OpenCorpora в алфавитном порядке. Абстрактные граммемы нумеруются сразу, а остальные -
+# при первом обращении к ним или к тегу, для чего загружается словарь анализатора (см. Backend.grammemes).
+_bits  = {}
+_order = []
+_tags  = {}
+_known = False
+
+
+def _init():
+    for values in ABSTRACT_GRAMMEMES.values():
+        for grammeme in values: _add(grammeme)
+
+
+def _init_known():
+    global _known
+    from .word import Word
+    if not _order: _init()
+    for grammeme in sorted(Word.default_backend().grammemes()): _add(grammeme)
+    _known = True
+
+
+def _add(grammeme):
+    if grammeme not in _bits:
+        _bits[grammeme] = 1 << len(_order)
+        _order.append(grammeme)
+    return _bits[grammeme]
+
+
+# Задаёт таблицу граммем целиком, без словаря анализатора, например таблицу, сохранённую
+# в хранилище разборов (см. store). Граммемы, которых ещё нет, получают биты в порядке списка,
+# и после этого таблица считается загруженной.
+def register(grammemes):
+    global _known
+    if not _order: _init()
+    for grammeme in grammemes: _add(grammeme)
+    _known = True
+
+
+# Список граммем в порядке битов.
+def grammemes():
+    if not _known: _init_known()
+    return list(_order)
+
+
+# Граммемы маски в порядке битов; граммемы, зарегистрированные после первого обращения (см. tag_mask), тоже учитываются.
+def mask_grammemes(mask):
+    if not _known: _init_known()
+    result = []
+    while mask:
+        bit   = mask & -mask
+        mask ^= bit
+        result.append(_order[bit.bit_length() - 1])
+    return result
+
+
+# Маска, содержащая все перечисленные граммемы. Неизвестные граммемы дают 0.
+def grammeme_mask(*grammemes):
+    if not _order: _init()
+    mask = 0
+    for grammeme in grammemes:
+        bit = _bits.get(grammeme)
+        if bit is None and not _known:
+            _init_known()
+            bit = _bits.get(grammeme)
+        mask |= bit or 0
+    return mask
+
+
+def tag_mask(tag):
+    mask = _tags.get(tag)
+    if mask is None:
+        if not _known: _init_known()
+        mask = 0
+        for grammeme in tag.grammemes: mask |= _add(grammeme)
+        _tags[tag] = mask
+    return mask
@@ -0,0 +1,349 @@
+from .seq import Seq
+from .masks import grammeme_mask
+from .patterns import LAZY, POSSESSIVE, Match, MatchBudget, PatternUnit, PatternUnits, PatternWord, PatternLexeme, PatternAny, PatternAll, \
+    PatternSeq, PatternRepeat, PatternSame, PatternNamed
+
+
+# Компиляция дерева шаблонов в недетерминированный автомат над предикатами слов
+# и его моделирование по Томпсону (Pike VM): все ветви перебора продвигаются по предложению
+# одновременно, и на каждой позиции автомат хранит не больше одного потока на состояние.
+# Время сопоставления линейно по длине предложения, экспоненциального перебора нет.
+#
+# Автомат возвращает то же совпадение, что и первое совпадение match_gen: потоки упорядочены
+# по приоритету ветвей в порядке перебора генераторов, а найденное совпадение отсекает
+# менее приоритетные потоки.
+#
+# PatternSame упорядочивает варианты граммем по длине подходящего префикса, поэтому
+# ветвление для него вычисляется во время работы автомата: для каждого варианта граммем
+# компилируется своя копия вложенного шаблона, а длина префикса ограничивает поток.
+# Шаблоны, которые автомат не выражает (PatternAll над многословными шаблонами,
+# повторы в режиме POSSESSIVE, пользовательские подклассы), сопоставляются прежним генераторным движком.
+
+CONSUME, SPLIT, JMP, ATEND, SAME, POP, OPEN, CLOSE, MATCH, FAIL = range(10)
+
+UNIT, WORD, LEXEME = range(3)
+
+
+class Unsupported(Exception):
+    pass
+
+
+# Состояние потока: номер инструкции, найденные слова (список-цепочка в обратном порядке),
+# их число, начало открытой группы, закрытые группы (цепочка) и стек ограничений длины от PatternSame.
+class Thread(object):
+    __slots__ = ('pc', 'words', 'count', 'opened', 'groups', 'limits')
+
+    def __init__(self, pc, words, count, opened, groups, limits):
+        self.pc     = pc
+        self.words  = words
+        self.count  = count
+        self.opened = opened
+        self.groups = groups
+        self.limits = limits
+
+
+class Compiler(object):
+    __slots__ = ('code', 'max_size')
+
+    def __init__(self, max_size):
+        self.code     = []
+        self.max_size = max_size
+
+    def emit(self, *instr):
+        if len(self.code) >= self.max_size: raise Unsupported('Automaton is too large')
+        self.code.append(list(instr))
+        return len(self.code) - 1
+
+    # mask - граммемы, которые навязывает охватывающий PatternSame,
+    # named - находимся ли внутри именованной группы (вложенные группы PatternNamed отбрасывает).
+    def compile(self, pattern, mask = 0, named = False):
+        preds = Compiler.predicates(pattern)
+        if preds is not None:
+            self.emit(CONSUME, mask, preds)
+
+        elif isinstance(pattern, PatternAny):
+            jumps = []
+            for pattern_ in pattern.patterns[:-1]:
+                split = self.emit(SPLIT, None, None)
+                self.code[split][1] = len(self.code)
+                self.compile(pattern_, mask, named)
+                jumps.append(self.emit(JMP, None))
+                self.code[split][2] = len(self.code)
+            self.compile(pattern.patterns[-1], mask, named)
+            for jump in jumps: self.code[jump][1] = len(self.code)
+
+        elif isinstance(pattern, PatternSeq):
+            for part in pattern.parts: self.compile(part, mask, named)
+
+        elif isinstance(pattern, PatternRepeat):
+            if pattern.mode == POSSESSIVE: raise Unsupported('Possessive repeat')
+            self.repeat(pattern.sub, pattern.min_repeats, pattern.max_repeats, mask, named, pattern.mode == LAZY)
+
+        elif isinstance(pattern, PatternSame):
+            same     = self.emit(SAME, mask, pattern, {}, None)
+            branches = {}
+            jumps    = []
+            for path in Compiler.same_paths(pattern.grms):
+                branches[path] = len(self.code)
+                self.compile(pattern.sub, mask | grammeme_mask(*path), named)
+                self.emit(POP)
+                jumps.append(self.emit(JMP, None))
+            self.code[same][3] = branches
+            self.code[same][4] = len(self.code)
+            self.compile(pattern.sub, mask, named)
+            self.emit(POP)
+            for jump in jumps: self.code[jump][1] = len(self.code)
+
+        elif isinstance(pattern, PatternNamed):
+            if named:
+                self.compile(pattern.sub, mask, named)
+            else:
+                self.emit(OPEN)
+                self.compile(pattern.sub, mask, True)
+                self.emit(CLOSE, pattern.name)
+
+        else:
+            raise Unsupported(type(pattern).__name__)
+
+    # Повторы раскрываются так же, как PatternRepeat.match_gen перебирает rest:
+    # сначала продолжение, потом остановка (lazy - наоборот). Продолжение пробуется, только если слова не кончились.
+    def repeat(self, sub, min_repeats, max_repeats, mask, named, lazy = False):
+        if max_repeats is not None and (max_repeats == 0 or max_repeats < min_repeats):
+            self.emit(FAIL)
+            return
+        loop  = None
+        split = None
+        if min_repeats == 0:
+            split = self.emit(SPLIT, None, len(self.code) + 1) if lazy else self.emit(SPLIT, len(self.code) + 1, None)
+            loop  = split if max_repeats is None else None
+        self.compile(sub, mask, named)
+        if max_repeats is None or max_repeats > 1:
+            atend = self.emit(ATEND, None)
+            if loop is not None:
+                self.emit(JMP, loop)
+            else:
+                self.repeat(sub, max(min_repeats - 1, 0), max_repeats - 1 if max_repeats is not None else None, mask, named, lazy)
+            if min_repeats <= 1: self.code[atend][1] = len(self.code)
+        elif min_repeats > 1:
+            self.emit(FAIL)
+        if split is not None: self.code[split][1 if lazy else 2] = len(self.code)
+
+    # Однословный шаблон как цепочка предикатов (UNIT, WORD, LEXEME) или None.
+    @staticmethod
+    def predicates(pattern):
+        if isinstance(pattern, PatternUnit):   return ((UNIT, pattern.grammeme),)
+        if isinstance(pattern, PatternUnits):  return tuple((UNIT, grammeme) for grammeme in pattern.grammemes)
+        if isinstance(pattern, PatternWord):   return ((WORD, pattern.word),)
+        if isinstance(pattern, PatternLexeme): return ((LEXEME, pattern.normal_form),)
+        if isinstance(pattern, PatternAll):
+            preds = ()
+            for pattern_ in pattern.patterns:
+                preds_ = Compiler.predicates(pattern_)
+                if preds_ is None: return None
+                preds += preds_
+            return preds
+        return None
+
+    @staticmethod
+    def same_paths(grms):
+        paths = [()]
+        for variants in grms: paths = [path + (grm,) for path in paths for grm in variants]
+        return paths
+
+
+class Automaton(object):
+    __slots__ = ('pattern', 'code', 'min')
+
+    def __init__(self, pattern, code):
+        self.pattern = pattern
+        self.code    = code
+        self.min     = pattern.min
+
+    def match(self, seq, steps = None, timeout = None):
+        if type(seq) == str: seq = Seq(seq)
+        return self.run(list(seq), 0, Automaton.budget(steps, timeout))
+
+    def test(self, seq, steps = None, timeout = None):
+        return self.match(seq, steps, timeout) != None
+
+    def search(self, seq, steps = None, timeout = None):
+        for match in self.finditer(seq, steps, timeout): return match
+
+    # Непересекающиеся совпадения слева направо, как PatternAbstract.finditer.
+    def finditer(self, seq, steps = None, timeout = None):
+        if type(seq) == str: seq = Seq(seq)
+        budget = Automaton.budget(steps, timeout)
+        words  = list(seq)
+        start  = 0
+        while len(words) - start >= self.min:
+            match = self.run(words, start, budget)
+            if match is None:
+                start += 1
+                continue
+            yield match
+            start = match.end if match.end > start else start + 1
+
+    def findall(self, seq, steps = None, timeout = None):
+        return list(self.finditer(seq, steps, timeout))
+
+    # Шаг автомата - продвижение одного потока на одно слово.
+    @staticmethod
+    def budget(steps, timeout):
+        if steps is None and timeout is None: return None
+        return MatchBudget(steps, timeout)
+
+    # Сопоставление, привязанное к слову start.
+    def run(self, words, start, budget = None):
+        code    = self.code
+        length  = len(words)
+        pos     = start
+        matched = None
+        threads = []
+        self.add(threads, set(), words, pos, Thread(0, None, 0, None, None, None))
+
+        while threads:
+            following = []
+            visited   = set()
+            for thread in threads:
+                instr = code[thread.pc]
+                if instr[0] == MATCH:
+                    matched = thread
+                    break
+                if budget is not None: budget.step(self.pattern)
+                limit = thread.limits[0] if thread.limits else length
+                if pos >= limit: continue
+                word = Automaton.consume(words[pos], instr[1], instr[2])
+                if word is None: continue
+                self.add(following, visited, words, pos + 1, Thread(
+                    thread.pc + 1, (word, thread.words), thread.count + 1,
+                    thread.opened, thread.groups, thread.limits,
+                ))
+            threads = following
+            pos    += 1
+
+        if matched is None: return None
+        return Automaton.build(matched, start)
+
+    # Добавляет поток и все состояния, достижимые из него без чтения слов, в порядке приоритета.
+    def add(self, threads, visited, words, pos, thread):
+        code  = self.code
+        stack = [thread]
+        while stack:
+            thread = stack.pop()
+            key    = (thread.pc, thread.limits)
+            if key in visited: continue
+            visited.add(key)
+            instr = code[thread.pc]
+            op    = instr[0]
+
+            if op == JMP:
+                thread.pc = instr[1]
+                stack.append(thread)
+            elif op == SPLIT:
+                stack.append(Thread(instr[2], thread.words, thread.count, thread.opened, thread.groups, thread.limits))
+                thread.pc = instr[1]
+                stack.append(thread)
+            elif op == OPEN:
+                thread.pc     = thread.pc + 1
+                thread.opened = thread.count
+                stack.append(thread)
+            elif op == CLOSE:
+                thread.pc     = thread.pc + 1
+                thread.groups = ((instr[1], thread.opened, thread.count), thread.groups)
+                thread.opened = None
+                stack.append(thread)
+            elif op == ATEND:
+                limit = thread.limits[0] if thread.limits else len(words)
+                if pos >= limit:
+                    if instr[1] is None: continue
+                    thread.pc = instr[1]
+                else:
+                    thread.pc = thread.pc + 1
+                stack.append(thread)
+            elif op == POP:
+                thread.pc     = thread.pc + 1
+                thread.limits = thread.limits[1]
+                stack.append(thread)
+            elif op == SAME:
+                limit    = thread.limits[0] if thread.limits else len(words)
+                branches = [(instr[3][path], pos + size) for path, size in Automaton.same_alternatives(
+                    instr[2], words, pos, limit, instr[1], 0, ()
+                )]
+                branches.append((instr[4], pos))
+                for pc, stop in reversed(branches):
+                    stack.append(Thread(pc, thread.words, thread.count, thread.opened, thread.groups, (stop, thread.limits)))
+            elif op == FAIL:
+                continue
+            else:
+                threads.append(thread)
+
+    # Варианты граммем PatternSame в порядке PatternSame.constrain_same: пары (путь граммем, длина префикса).
+    @staticmethod
+    def same_alternatives(pattern, words, pos, limit, mask, level, path):
+        cap   = pattern.max + 1 if pattern.max is not None else limit - pos
+        found = []
+        for grm in pattern.grms[level]:
+            mask_ = mask | grammeme_mask(grm)
+            size  = 0
+            while size < cap and pos + size < limit:
+                if words[pos + size].constrain_mask(mask_) is None: break
+                size += 1
+            if size and size >= pattern.min: found.append((grm, mask_, size))
+        found.sort(key = lambda f: f[2], reverse = True)
+
+        alternatives = []
+        for grm, mask_, size in found:
+            if level + 1 < len(pattern.grms):
+                alternatives.extend(Automaton.same_alternatives(
+                    pattern, words, pos, pos + size, mask_, level + 1, path + (grm,)
+                ))
+            else:
+                alternatives.append((path + (grm,), size))
+        return alternatives
+
+    @staticmethod
+    def consume(word, mask, preds):
+        if mask:
+            word = word.constrain_mask(mask)
+            if word is None: return None
+        for kind, arg in preds:
+            if kind == UNIT:
+                word = word.constrain(arg)
+            elif kind == WORD:
+                if word.text != arg: return None
+            else:
+                word = word.constrain_normal_form(arg)
+            if word is None: return None
+        return word
+
+    @staticmethod
+    def build(thread, start):
+        words = []
+        chain = thread.words
+        while chain is not None:
+            words.append(chain[0])
+            chain = chain[1]
+        words.reverse()
+
+        closed = []
+        chain  = thread.groups
+        while chain is not None:
+            closed.append(chain[0])
+            chain = chain[1]
+        groups = {}
+        for name, begin, end in reversed(closed):
+            groups.setdefault(name, []).append(Seq.from_words(words[begin:end]))
+
+        return Match(Seq.from_words(words), groups, start)
+
+
+# Компилирует шаблон в автомат с тем же интерфейсом match/test/search/finditer/findall.
+# Если шаблон не выражается автоматом, возвращает сам шаблон (генераторный движок).
+def compile_automaton(pattern, max_size = 100000):
+    compiler = Compiler(max_size)
+    try:
+        compiler.compile(pattern)
+    except Unsupported:
+        return pattern
+    compiler.emit(MATCH)
+    return Automaton(pattern, compiler.code)
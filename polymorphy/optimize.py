@@ -0,0 +1,137 @@
+from .constants import ANY, ABSTRACT_GRAMMEMES
+from .patterns import GREEDY, POSSESSIVE, PatternUnit, PatternUnits, PatternWord, PatternLexeme, PatternAny, PatternAll, \
+    PatternSeq, PatternRepeat, PatternMaybe, PatternSame, PatternNamed
+
+
+NODES = (
+    PatternUnit, PatternUnits, PatternWord, PatternLexeme, PatternAny, PatternAll,
+    PatternSeq, PatternRepeat, PatternMaybe, PatternSame, PatternNamed,
+)
+PREDICATES = (PatternUnit, PatternUnits, PatternWord, PatternLexeme)
+
+
+# Упрощение дерева шаблонов перед сопоставлением: меньше узлов - меньше генераторов в переборе.
+#
+#   seq { a seq { b c } }          -> seq { a b c }           вложенные seq, any и all раскрываются;
+#   any { a b a }                  -> any { a b }             повторные варианты any отбрасываются;
+#   all { NOUN word("стол") gent } -> all { word("стол") PatternUnits(NOUN, gent) }
+#                                  однословные условия all переставляются: сначала сравнение строки,
+#                                  потом нормальная форма, и граммемы проверяются одной маской;
+#   repeat { maybe { a } }         -> repeat { a }            повтор необязательного шаблона
+#   maybe { repeat(1:) { a } }     -> repeat { a }            и необязательный повтор - один повтор;
+#   maybe { maybe { a } }          -> maybe { a }
+#   seq { a }, repeat(1:1) { a }   -> a
+#
+# Повторы упрощаются в своём режиме: repeat(lazy) { maybe(lazy) { a } } -> repeat(lazy) { a },
+# а повторы с разными режимами остаются вложенными. repeat(1:1 possessive) { a } не раскрывается:
+# он оставляет только первое совпадение a.
+#
+# Первое совпадение шаблона (match, test, search, finditer) после упрощения то же. Число и порядок
+# остальных совпадений могут отличаться: одинаковые варианты any и пустые повторы больше не дублируются.
+# Кроме того, повтор шаблона, который совпадает с пустой последовательностью (repeat { maybe { a } }),
+# без упрощения перебирается бесконечно, а после упрощения - нет. Остальные повторы повторов
+# (repeat { repeat(1:) { a } }, repeat(2:) { maybe { a } }) перебирают совпадения в другом порядке и не упрощаются.
+#
+# Исходное дерево не изменяется. Узлы пользовательских подклассов оставляются как есть.
+def optimize(pattern):
+    cls = type(pattern)
+    if cls is PatternSeq:
+        parts = flatten(PatternSeq, [optimize(p) for p in pattern.parts])
+        return parts[0] if len(parts) == 1 else PatternSeq(*parts)
+    if cls is PatternAny:
+        patterns = dedupe(flatten(PatternAny, [optimize(p) for p in pattern.patterns]))
+        return patterns[0] if len(patterns) == 1 else PatternAny(*patterns)
+    if cls is PatternAll:
+        patterns = predicates(flatten(PatternAll, [optimize(p) for p in pattern.patterns]))
+        return patterns[0] if len(patterns) == 1 else PatternAll(*patterns)
+    if cls is PatternMaybe:
+        return maybe(optimize(pattern.sub), pattern.mode)
+    if cls is PatternRepeat:
+        return repeat(optimize(pattern.sub), pattern.min_repeats, pattern.max_repeats, pattern.mode)
+    if cls is PatternSame:
+        return PatternSame(pattern.__reduce__()[1][0], optimize(pattern.sub))
+    if cls is PatternNamed:
+        return PatternNamed(pattern.name, optimize(pattern.sub))
+    return pattern
+
+
+def flatten(cls, patterns):
+    result = []
+    for pattern in patterns:
+        if type(pattern) is not cls: result.append(pattern)
+        elif cls is PatternSeq: result.extend(pattern.parts)
+        else: result.extend(pattern.patterns)
+    return result
+
+
+# Варианты без повторов; одинаковые варианты - с одинаковой структурой (см. key).
+def dedupe(patterns):
+    seen   = set()
+    result = []
+    for pattern in patterns:
+        pattern_key = key(pattern)
+        if pattern_key in seen: continue
+        seen.add(pattern_key)
+        result.append(pattern)
+    return result
+
+
+# Структурный ключ шаблона по __reduce__; для объектов, которые не сводятся к аргументам конструктора, - сам объект.
+def key(value):
+    if isinstance(value, (list, tuple)): return tuple(key(v) for v in value)
+    if type(value) not in NODES: return value
+    cls, args = value.__reduce__()[:2]
+    return (cls,) + tuple(key(a) for a in args)
+
+
+# Однословные условия подряд в PatternAll сужают одно и то же слово и поэтому переставимы:
+# строка сравнивается первой, затем нормальная форма, затем все граммемы одной маской.
+# Многословные шаблоны остаются на своих местах и разделяют группы условий.
+def predicates(patterns):
+    result = []
+    group  = []
+    for pattern in patterns:
+        if type(pattern) in PREDICATES:
+            group.append(pattern)
+            continue
+        result.extend(merge(group))
+        group = []
+        result.append(pattern)
+    result.extend(merge(group))
+    return result
+
+
+def merge(group):
+    if not group: return []
+    words     = [p for p in group if type(p) is PatternWord]
+    lexemes   = [p for p in group if type(p) is PatternLexeme]
+    grammemes = []
+    abstract  = []
+    for pattern in group:
+        if type(pattern) is PatternUnits:
+            grammemes.extend(pattern.grammemes)
+        elif type(pattern) is PatternUnit:
+            if pattern.grammeme == ANY: continue
+            if pattern.grammeme in ABSTRACT_GRAMMEMES: abstract.append(pattern)
+            elif pattern.grammeme not in grammemes: grammemes.append(pattern.grammeme)
+    units = []
+    if len(grammemes) == 1: units.append(PatternUnit(grammemes[0]))
+    elif grammemes: units.append(PatternUnits(*grammemes))
+    result = words + lexemes + units + abstract
+    return result if result else [PatternUnit(ANY)]
+
+
+# Вложенные повторы объединяются, только если их режимы (GREEDY, LAZY, POSSESSIVE) совпадают.
+def maybe(sub, mode = GREEDY):
+    if type(sub) is PatternMaybe and sub.mode == mode: return sub
+    if type(sub) is PatternRepeat and sub.mode == mode and sub.min_repeats <= 1 and sub.max_repeats is None:
+        return PatternRepeat(sub.sub, 0, None, mode)
+    return PatternMaybe(sub, mode)
+
+
+def repeat(sub, min_repeats, max_repeats, mode = GREEDY):
+    if min_repeats == 1 and max_repeats == 1 and mode != POSSESSIVE: return sub
+    if max_repeats is None and min_repeats <= 1 and type(sub) in (PatternMaybe, PatternRepeat) and sub.mode == mode:
+        if type(sub) is PatternMaybe: return PatternRepeat(sub.sub, 0, None, mode)
+        if sub.min_repeats == 0 and sub.max_repeats is None: return PatternRepeat(sub.sub, 0, None, mode)
+    return PatternRepeat(sub, min_repeats, max_repeats, mode)
@@ -1,19 +1,77 @@
+import time
 from .seq import Seq
+from .masks import grammeme_mask
 from .constants import ANY, ABSTRACT_GRAMMEMES
 
 
+# Совпадение: найденная последовательность, именованные группы и границы (номера слов) в исходном предложении.
+# Сумма совпадений не копирует слова: она хранит ссылки на слагаемые, а seq и groups
+# собираются при первом обращении. Так при переборе с возвратами не создаются промежуточные Seq.
 class Match(object):
-    __slots__ = ('seq', 'groups')
+    __slots__ = ('start', 'end', '__seq', '__groups', '__head', '__tail')
 
-    def __init__(self, seq, groups = {}):
-        self.seq    = seq
-        self.groups = groups
+    def __init__(self, seq, groups = {}, start = 0):
+        self.start    = start
+        self.end      = start + len(seq)
+        self.__seq    = seq
+        self.__groups = groups
+        self.__head   = None
+        self.__tail   = None
 
     def __add__(self, other):
-        return Match(self.seq + other.seq, Match.merge_groups(self.groups, other.groups))
+        match          = Match.__new__(Match)
+        match.start    = self.start
+        match.end      = self.end + other.end - other.start
+        match.__seq    = None
+        match.__groups = None
+        match.__head   = self
+        match.__tail   = other
+        return match
+
+    def __reduce__(self):
+        return (Match, (self.seq, self.groups, self.start))
+
+    @property
+    def seq(self):
+        if self.__seq is None: self.__materialize()
+        return self.__seq
+
+    @property
+    def groups(self):
+        if self.__groups is None: self.__materialize()
+        return self.__groups
+
+    # Возвращает копию совпадения, сдвинутую на offset слов.
+    def shift(self, offset):
+        match          = Match.__new__(Match)
+        match.start    = self.start + offset
+        match.end      = self.end + offset
+        match.__seq    = self.__seq
+        match.__groups = self.__groups
+        match.__head   = self.__head
+        match.__tail   = self.__tail
+        return match
+
+    # Обходит дерево слагаемых без рекурсии и собирает слова и группы.
+    def __materialize(self):
+        words  = []
+        groups = {}
+        stack  = [self]
+        while stack:
+            match = stack.pop()
+            if match.__seq is None:
+                stack.append(match.__tail)
+                stack.append(match.__head)
+                continue
+            words.extend(match.__seq)
+            groups = Match.merge_groups(groups, match.__groups)
+        self.__seq    = Seq.from_words(words)
+        self.__groups = groups
+        self.__head   = None
+        self.__tail   = None
 
     def __repr__(self):
-        seq_repr = ' '.join(w.__repr__() for w in self.seq.words)
+        seq_repr = ' '.join(w.__repr__() for w in self.seq)
 
         count    = 0
         for n, g in self.groups.items(): count += len(g)
@@ -39,15 +97,208 @@ class Match(object):
         return gs3
 
 
+# Превышен бюджет шагов или время сопоставления. pattern - узел, на котором перебор был прерван,
+# steps - сколько шагов успело пройти.
+class MatchLimitExceeded(Exception):
+    def __init__(self, message, pattern, steps):
+        super().__init__(message)
+        self.pattern = pattern
+        self.steps   = steps
+
+
+# Ограничение перебора: шаг - вход в узел шаблона или очередное совпадение узла.
+# Часы опрашиваются раз в check_every шагов, чтобы не замедлять перебор.
+class MatchBudget(object):
+    __slots__ = ('steps', 'deadline', 'count')
+
+    check_every = 64
+
+    def __init__(self, steps = None, timeout = None):
+        self.steps    = steps
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.count    = 0
+
+    def step(self, pattern):
+        self.count += 1
+        if self.steps is not None and self.count > self.steps:
+            raise MatchLimitExceeded('Match step budget exceeded', pattern, self.count)
+        if self.deadline is not None and self.count % MatchBudget.check_every == 0 \
+                and time.monotonic() > self.deadline:
+            raise MatchLimitExceeded('Match timeout exceeded', pattern, self.count)
+
+
+# Состояние одного вызова match/test/search: включённые режимы сопоставления.
+#
+# При packrat = True совпадения каждого узла на каждом срезе предложения запоминаются,
+# и повторный перебор того же узла с той же позиции (rest в PatternSeq и PatternRepeat)
+# читает готовые результаты. Кроме того, узел отдаёт только первое совпадение каждой длины:
+# родитель продолжает сопоставление с конца совпадения, и остальные совпадения той же длины
+# не могут дать более раннего результата. Число совпадений узла на позиции ограничено
+# длиной предложения, и время перебора становится полиномиальным. Первое совпадение
+# (match, test, search, finditer) при этом то же, что и без packrat.
+# Исключение - первый шаблон PatternAll: его совпадения важны целиком, а не только длиной,
+# поэтому он перебирается в точном режиме (exact). Длинные предложения в этом режиме, как и без него,
+# перебираются на явном стеке (см. PatternAbstract.match_iter), и длина входа не ограничена пределом рекурсии.
+#
+# steps и timeout (секунды) ограничивают весь вызов; при превышении бросается MatchLimitExceeded.
+# Профиль (см. profiler.Profile) записывает статистику каждого узла; контекст с профилем - ProfiledContext.
+# Вариант перебора выбирается один раз при создании контекста (create), поэтому без профиля
+# перебор узла его наличие не проверяет.
+class MatchContext(object):
+    __slots__ = ('memo', 'distinct', 'budget', 'profile')
+
+    def __init__(self, packrat = False, steps = None, timeout = None):
+        self.memo     = {} if packrat else None
+        self.distinct = packrat
+        self.budget   = MatchBudget(steps, timeout) if steps is not None or timeout is not None else None
+        self.profile  = None
+
+    # Контекст нужен, только если включён хотя бы один режим; иначе None и перебор идёт без накладных расходов.
+    @staticmethod
+    def create(packrat = False, steps = None, timeout = None, profile = None):
+        if profile is not None: return ProfiledContext(packrat, steps, timeout, profile)
+        if not packrat and steps is None and timeout is None: return None
+        return MatchContext(packrat, steps, timeout)
+
+    # Тот же контекст, но без отбрасывания совпадений одинаковой длины.
+    def exact(self):
+        if not self.distinct: return self
+        ctx          = type(self).__new__(type(self))
+        ctx.memo     = self.memo
+        ctx.distinct = False
+        ctx.budget   = self.budget
+        ctx.profile  = self.profile
+        return ctx
+
+    def gen(self, pattern, seq, lvl):
+        if self.memo is None:
+            gen = pattern.match_gen(seq, lvl, self)
+        else:
+            key   = (id(pattern), seq.key, self.distinct)
+            entry = self.memo.get(key)
+            if entry is None:
+                entry = MemoEntry(pattern, seq, pattern.match_gen(seq, lvl, self), self.distinct)
+                self.memo[key] = entry
+            gen = entry.replay()
+        if self.budget is not None: gen = MatchContext.guard(self.budget, pattern, gen)
+        return gen
+
+    @staticmethod
+    def guard(budget, pattern, gen):
+        budget.step(pattern)
+        for match in gen:
+            budget.step(pattern)
+            yield match
+
+
+# Контекст с профилем: перебор каждого узла оборачивается профилем (см. profiler.Profile.wrap).
+class ProfiledContext(MatchContext):
+    __slots__ = ()
+
+    def __init__(self, packrat = False, steps = None, timeout = None, profile = None):
+        super().__init__(packrat, steps, timeout)
+        self.profile = profile
+
+    def gen(self, pattern, seq, lvl):
+        return self.profile.wrap(pattern, seq, lvl, MatchContext.gen(self, pattern, seq, lvl))
+
+
+# Запомненные совпадения узла на срезе. Генератор продвигается лениво, по мере запроса.
+# Повторный запрос, пока генератор выполняется (пустой цикл в повторе), видит только уже найденное.
+class MemoEntry(object):
+    __slots__ = ('pattern', 'seq', 'gen', 'matches', 'lengths', 'running')
+
+    def __init__(self, pattern, seq, gen, distinct):
+        self.pattern = pattern
+        self.seq     = seq
+        self.gen     = gen
+        self.matches = []
+        self.lengths = set() if distinct else None
+        self.running = False
+
+    def replay(self):
+        matches = self.matches
+        i = 0
+        while True:
+            if i < len(matches):
+                yield matches[i]
+                i += 1
+                continue
+            if self.gen is None or self.running: return
+            self.running = True
+            try:
+                match = self.advance()
+            finally:
+                self.running = False
+            if match is None:
+                self.gen = None
+                return
+            matches.append(match)
+
+    def advance(self):
+        lengths = self.lengths
+        for match in self.gen:
+            if lengths is None: return match
+            length = match.end - match.start
+            if length not in lengths:
+                lengths.add(length)
+                return match
+        return None
+
+
 class PatternAbstract(object):
     __slots__ = tuple()
 
-    def match(self, seq):
+    iterative_from = 128
+
+    def match(self, seq, packrat = False, steps = None, timeout = None, profile = None):
+        if type(seq) == str: seq = Seq(seq)
+        for match in self.match_iter(seq, MatchContext.create(packrat, steps, timeout, profile)): return match
+
+    def test(self, seq, packrat = False, steps = None, timeout = None, profile = None):
         if type(seq) == str: seq = Seq(seq)
-        for match in self.match_gen(seq): return match
+        for match in self.match_iter(seq, MatchContext.create(packrat, steps, timeout, profile)): return match != None
 
-    def test(self, seq):
-        for match in self.match_gen(seq): return match != None
+    # Возвращает первое совпадение, начинающееся с любого слова предложения.
+    def search(self, seq, packrat = False, steps = None, timeout = None, profile = None):
+        for match in self.finditer(seq, packrat, steps, timeout, profile): return match
+
+    # Перебирает непересекающиеся совпадения слева направо за один проход по предложению.
+    # Позиции, с которых осталось меньше self.min слов, не проверяются.
+    # После пустого совпадения поиск продолжается со следующего слова.
+    # Бюджет steps и timeout общий для всего прохода.
+    def finditer(self, seq, packrat = False, steps = None, timeout = None, profile = None):
+        if type(seq) == str: seq = Seq(seq)
+        ctx    = MatchContext.create(packrat, steps, timeout, profile)
+        length = len(seq)
+        start  = 0
+        while length - start >= self.min:
+            found = None
+            for found in self.match_iter(seq[start:], ctx): break
+            if found is None:
+                start += 1
+                continue
+            match = found.shift(start)
+            yield match
+            start = match.end if match.end > start else start + 1
+
+    # Перебор совпадений для match, test и finditer. Предложения от iterative_from слов перебираются
+    # на явном стеке (см. iterative) в любом режиме контекста, в том числе с packrat и профилем:
+    # глубина рекурсии генераторов растёт с длиной предложения, и на нескольких сотнях слов перебор
+    # упирается в предел рекурсии Python. Короткие предложения быстрее перебираются генераторами match_gen.
+    # iterative_from = 0 - всегда явный стек, None - всегда генераторы.
+    def match_iter(self, seq, ctx = None):
+        limit = PatternAbstract.iterative_from
+        if limit is None or len(seq) < limit: return self.match_ctx(seq, 0, ctx)
+        return iterate(self, seq, ctx)
+
+    # Перебор совпадений в контексте сопоставления; без контекста - просто match_gen.
+    def match_ctx(self, seq, lvl = 0, ctx = None):
+        if ctx is None: return self.match_gen(seq, lvl)
+        return ctx.gen(self, seq, lvl)
+
+    def findall(self, seq, packrat = False, steps = None, timeout = None, profile = None):
+        return list(self.finditer(seq, packrat, steps, timeout, profile))
 
 
 class PatternUnit(PatternAbstract):
@@ -58,10 +309,46 @@ class PatternUnit(PatternAbstract):
         self.max = 1
         self.grammeme = grammeme
 
-    def match_gen(self, seq, lvl = 0):
+    def __reduce__(self):
+        return (PatternUnit, (self.grammeme,))
+
+    def match_gen(self, seq, lvl = 0, ctx = None):
         if len(seq) < self.min: return
-        found = seq[:1].constrain_find(self.grammeme)
-        if found: yield Match(found)
+        word = seq[0].constrain(self.grammeme)
+        if word is None: return
+        yield Match(seq[:1] if word is seq[0] else Seq.from_words([word]))
+
+
+# Слово, у которого есть варианты со всеми граммемами сразу: то же, что PatternAll из нескольких PatternUnit,
+# но за одну проверку маски (см. optimize). Абстрактные граммемы не поддерживаются.
+class PatternUnits(PatternAbstract):
+    __slots__ = ('min', 'max', 'grammemes', '__mask')
+
+    def __init__(self, *grammemes):
+        self.min       = 1
+        self.max       = 1
+        self.grammemes = list(grammemes)
+        self.__mask    = None
+
+    def __reduce__(self):
+        return (PatternUnits, tuple(self.grammemes))
+
+    # Маска вычисляется при первом сопоставлении: номера граммем словаря известны только после его загрузки.
+    # Неизвестная граммема, как и в PatternUnit, не выполняется ни на одном слове.
+    @property
+    def mask(self):
+        if self.__mask is None:
+            masks       = [grammeme_mask(g) for g in self.grammemes]
+            self.__mask = 0
+            if all(masks):
+                for mask in masks: self.__mask |= mask
+        return self.__mask
+
+    def match_gen(self, seq, lvl = 0, ctx = None):
+        if len(seq) < self.min: return
+        word = seq[0].constrain_mask(self.mask)
+        if word is None: return
+        yield Match(seq[:1] if word is seq[0] else Seq.from_words([word]))
 
 
 class PatternWord(PatternAbstract):
@@ -72,7 +359,10 @@ class PatternWord(PatternAbstract):
         self.max = 1
         self.word = word
 
-    def match_gen(self, seq, lvl = 0):
+    def __reduce__(self):
+        return (PatternWord, (self.word,))
+
+    def match_gen(self, seq, lvl = 0, ctx = None):
         if not len(seq): return
         if seq[0].text == self.word: yield Match(seq[:1])
 
@@ -85,9 +375,12 @@ class PatternLexeme(PatternAbstract):
         self.max = 1
         self.normal_form = normal_form
 
-    def match_gen(self, seq, lvl = 0):
+    def __reduce__(self):
+        return (PatternLexeme, (self.normal_form,))
+
+    def match_gen(self, seq, lvl = 0, ctx = None):
         if not len(seq): return
-        word = seq.words[0].constrain_normal_form(self.normal_form)
+        word = seq[0].constrain_normal_form(self.normal_form)
         if word: yield Match(Seq.from_words([word]))
 
 
@@ -104,10 +397,13 @@ class PatternAny(PatternAbstract):
                 break
             self.max = max([self.max, v.max])
 
-    def match_gen(self, seq, lvl = 0):
+    def __reduce__(self):
+        return (PatternAny, tuple(self.patterns))
+
+    def match_gen(self, seq, lvl = 0, ctx = None):
         if len(seq) < self.min: return
         for pattern in self.patterns:
-            for match in pattern.match_gen(seq, lvl + 1):
+            for match in pattern.match_ctx(seq, lvl + 1, ctx):
                 yield match
 
 
@@ -126,13 +422,17 @@ class PatternAll(PatternAbstract):
                 break
             self.max = max([self.max, v.max])
 
-    def match_gen(self, seq, lvl = 0):
+    # Цепочка rest восстанавливается конструктором и не сериализуется.
+    def __reduce__(self):
+        return (PatternAll, tuple(self.patterns))
+
+    def match_gen(self, seq, lvl = 0, ctx = None):
         if len(seq) < self.min: return
-        for match_first in self.first.match_gen(seq, lvl + 1):
+        for match_first in self.first.match_ctx(seq, lvl + 1, ctx.exact() if ctx is not None else None):
             if not self.rest:
                 yield match_first
             else:
-                for match_rest in self.rest.match_gen(match_first.seq, lvl + 1):
+                for match_rest in self.rest.match_ctx(match_first.seq, lvl + 1, ctx):
                     groups = Match.merge_groups(match_first.groups, match_rest.groups)
                     yield Match(match_rest.seq, groups)
 
@@ -152,51 +452,80 @@ class PatternSeq(PatternAbstract):
                 break
             self.max += p.max
 
-    def match_gen(self, seq, lvl = 0):
+    # Цепочка rest восстанавливается конструктором и не сериализуется.
+    def __reduce__(self):
+        return (PatternSeq, tuple(self.parts))
+
+    def match_gen(self, seq, lvl = 0, ctx = None):
         if len(seq) < self.min: return
 
-        for match_head in self.first.match_gen(seq, lvl + 1):
+        for match_head in self.first.match_ctx(seq, lvl + 1, ctx):
             if not self.rest:
                 yield match_head
             else:
-                for match_tail in self.rest.match_gen(seq[len(match_head.seq):], lvl + 1):
+                for match_tail in self.rest.match_ctx(seq[match_head.end - match_head.start:], lvl + 1, ctx):
                     yield match_head + match_tail
 
 
+# Режимы повтора:
+#   GREEDY     - сначала больше повторов, потом меньше, пустое совпадение последним;
+#   LAZY       - наоборот: сначала пустое совпадение, потом каждое совпадение sub без продолжения
+#                и только затем с продолжением; совпадения те же, что у GREEDY, в другом порядке;
+#   POSSESSIVE - только первое совпадение жадного перебора (атомарная группа): родитель не
+#                возвращается в повтор за более коротким вариантом, и перебор с возвратами обрывается.
+GREEDY, LAZY, POSSESSIVE = 'greedy', 'lazy', 'possessive'
+
+REPEAT_MODES = (GREEDY, LAZY, POSSESSIVE)
+
+
 class PatternRepeat(PatternAbstract):
-    __slots__ = ('min', 'max', 'min_repeats', 'max_repeats', 'sub', '__rest')
+    __slots__ = ('min', 'max', 'min_repeats', 'max_repeats', 'mode', 'sub', '__rest')
 
-    def __init__(self, pattern = ANY, min = 0, max = None):
+    def __init__(self, pattern = ANY, min = 0, max = None, mode = GREEDY):
+        if mode not in REPEAT_MODES: raise ValueError('Unknown repeat mode ' + str(mode))
         self.__rest      = None
         self.min_repeats = min
         self.max_repeats = max
+        self.mode        = mode
         self.sub = pattern if isinstance(pattern, PatternAbstract) else PatternUnit(pattern)
         self.min = self.sub.min * self.min_repeats
         self.max = self.sub.max * self.max_repeats if self.sub.max != None and self.max_repeats != None else None
 
     def __getitem__(self, ix):
-        return PatternRepeat(self.sub, ix.start or 0, ix.stop)
+        return PatternRepeat(self.sub, ix.start or 0, ix.stop, self.mode)
+
+    # Кэш rest не сериализуется.
+    def __reduce__(self):
+        return (PatternRepeat, (self.sub, self.min_repeats, self.max_repeats, self.mode))
 
-    def match_gen(self, seq, lvl = 0):
+    def match_gen(self, seq, lvl = 0, ctx = None):
         if len(seq) < self.min: return
         if self.max_repeats == 0: return
 
-        for match_head in self.sub.match_gen(seq, lvl + 1):
+        mode = self.mode
+        if mode == LAZY and self.min_repeats == 0:
+            yield Match(Seq())
+
+        for match_head in self.sub.match_ctx(seq, lvl + 1, ctx):
+            size             = match_head.end - match_head.start
             should_try_more  = \
-                len(seq) > len(match_head.seq) \
-                and (len(seq) - len(match_head.seq) >= self.min - self.sub.min) \
+                len(seq) > size \
+                and (len(seq) - size >= self.min - self.sub.min) \
                 and (self.max_repeats is None or self.max_repeats > 1)
             must_try_more = self.min_repeats > 1
 
             if should_try_more:
-                for match_tail in self.rest.match_gen(seq[len(match_head.seq):], lvl + 1):
+                for match_tail in self.rest.match_ctx(seq[match_head.end - match_head.start:], lvl + 1, ctx):
                     yield match_head + match_tail
+                    if mode == POSSESSIVE: return
             elif not must_try_more:
                 yield match_head
+                if mode == POSSESSIVE: return
 
-        if self.min_repeats == 0:
+        if self.min_repeats == 0 and mode != LAZY:
             yield Match(Seq())
 
+    # Продолжение повтора в том же режиме.
     @property
     def rest(self):
         if self.__rest is None:
@@ -206,16 +535,20 @@ class PatternRepeat(PatternAbstract):
                 self.__rest = PatternRepeat(
                     self.sub,
                     max(self.min_repeats - 1, 0),
-                    max(self.max_repeats - 1, 0) if self.max_repeats != None else None
+                    max(self.max_repeats - 1, 0) if self.max_repeats != None else None,
+                    self.mode,
                 )
         return self.__rest
 
 
 class PatternMaybe(PatternRepeat):
-    __slots__ = ('min', 'max', 'min_repeats', 'max_repeats', 'sub', '__rest')
+    __slots__ = ('min', 'max', 'min_repeats', 'max_repeats', 'mode', 'sub', '__rest')
+
+    def __init__(self, pattern, mode = GREEDY):
+        super().__init__(pattern, min = 0, max = 1, mode = mode)
 
-    def __init__(self, pattern):
-        super().__init__(pattern, min = 0, max = 1)
+    def __reduce__(self):
+        return (PatternMaybe, (self.sub, self.mode))
 
 
 class PatternSame(PatternAbstract):
@@ -228,11 +561,19 @@ class PatternSame(PatternAbstract):
         self.min    = self.sub.min
         self.max    = self.sub.max
 
-    def match_gen(self, seq, lvl = 0):
+    # Граммемы восстанавливаются по раскрытым спискам: абстрактная граммема - список из нескольких значений.
+    def __reduce__(self):
+        grms = []
+        for grm in self.grms:
+            if len(grm) == 1: grms.append(grm[0])
+            else: grms.append(next(name for name, values in ABSTRACT_GRAMMEMES.items() if values == grm))
+        return (PatternSame, (grms, self.sub))
+
+    def match_gen(self, seq, lvl = 0, ctx = None):
         if len(seq) < self.min: return
         constrained = self.constrain_same(seq)
         for constrained in self.constrain_same(seq, lvl):
-            for match in self.sub.match_gen(constrained, lvl + 1):
+            for match in self.sub.match_ctx(constrained, lvl + 1, ctx):
                 yield match
 
     def constrain_same(self, seq, lvl = 0):
@@ -263,8 +604,14 @@ class PatternNamed(PatternAbstract):
         self.min  = self.sub.min
         self.max  = self.sub.max
 
-    def match_gen(self, seq, lvl = 0):
+    def __reduce__(self):
+        return (PatternNamed, (self.name, self.sub))
+
+    def match_gen(self, seq, lvl = 0, ctx = None):
         name = self.name
-        for match in self.sub.match_gen(seq):
+        for match in self.sub.match_ctx(seq, lvl + 1, ctx):
             groups = {self.name: [match.seq]}
             yield Match(match.seq, groups)
+
+
+from .iterative import iterate
@@ -0,0 +1,124 @@
+from .seq import Seq
+from .word import Word
+from .patterns import MatchContext, PatternAbstract, PatternSeq, PatternAll
+from .prefilter import Prefilter, WORD
+
+
+# Набор именованных шаблонов, которые ищутся в предложении за один проход.
+#
+# Одинаковые поддеревья разных шаблонов (и хвосты rest в PatternSeq и PatternAll) сводятся
+# к одному объекту, а все шаблоны сопоставляются в общем контексте с packrat-памятью:
+# совпадения общего узла на каждой позиции предложения вычисляются один раз для всего набора.
+# Ограничения слов граммемами разделяются через память Word.constrain.
+#
+# Шаблоны распределяются по первым словам (см. prefilter.first): на каждой позиции
+# пробуются только шаблоны, которые могут начаться с этого слова, а шаблоны, обязательные
+# слова и лексемы которых в предложении не встречаются, не пробуются вовсе.
+class PatternSet(object):
+    __slots__ = ('names', 'patterns', 'prefilters', '__nodes', '__by_word', '__by_form', '__by_lexeme', '__general')
+
+    def __init__(self, patterns = None):
+        self.names       = []
+        self.patterns    = {}
+        self.prefilters  = {}
+        self.__nodes     = {}
+        self.__by_word   = {}
+        self.__by_form   = {}
+        self.__by_lexeme = []
+        self.__general   = []
+        if patterns is None: return
+        if isinstance(patterns, dict): patterns = patterns.items()
+        for name, pattern in patterns: self.add(name, pattern)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.patterns
+
+    # Шаблон - объект PatternAbstract или текст на языке dsl.
+    def add(self, name, pattern):
+        if name in self.patterns: raise ValueError('Duplicate pattern ' + str(name))
+        if type(pattern) == str:
+            from .dsl import compile_pattern
+            pattern = compile_pattern(pattern)
+        pattern   = self.intern(pattern)
+        prefilter = Prefilter(pattern)
+        self.names.append(name)
+        self.patterns[name]   = pattern
+        self.prefilters[name] = prefilter
+        if prefilter.nullable or prefilter.first is None:
+            self.__general.append(name)
+            return
+        for kind, arg in prefilter.first:
+            if kind == WORD:
+                self.__by_word.setdefault(arg, []).append(name)
+                continue
+            if name not in self.__by_lexeme: self.__by_lexeme.append(name)
+            for form in Word.lexeme_forms(arg): self.__by_form.setdefault(form, []).append(name)
+
+    # Возвращает узел, равный шаблону, общий для всего набора.
+    # Пользовательские шаблоны без __reduce__ остаются как есть.
+    def intern(self, pattern):
+        try:
+            cls, args = pattern.__reduce__()[:2]
+        except TypeError:
+            return pattern
+        if not isinstance(cls, type) or not issubclass(cls, PatternAbstract): return pattern
+        args = tuple(self.intern(a) if isinstance(a, PatternAbstract) else a for a in args)
+        key  = (cls, tuple(id(a) if isinstance(a, PatternAbstract) else PatternSet.freeze(a) for a in args))
+        node = self.__nodes.get(key)
+        if node is None:
+            node = cls(*args)
+            if isinstance(node, (PatternSeq, PatternAll)) and node.rest is not None:
+                node.rest = self.intern(node.rest)
+            self.__nodes[key] = node
+        return node
+
+    @staticmethod
+    def freeze(value):
+        if isinstance(value, (list, tuple)): return tuple(PatternSet.freeze(v) for v in value)
+        return value
+
+    # Пары (имя, совпадение) в порядке начала совпадений, при равном начале - в порядке добавления шаблонов.
+    # Совпадения одного шаблона не пересекаются, как в PatternAbstract.finditer.
+    # Бюджет steps и timeout общий для всего набора.
+    def finditer(self, seq, packrat = True, steps = None, timeout = None):
+        if type(seq) == str: seq = Seq(seq)
+        order  = {name: i for i, name in enumerate(self.names)}
+        active = [name for name in self.names if self.prefilters[name].accepts(seq)]
+        if not active: return
+        active = set(active)
+        ctx    = MatchContext.create(packrat, steps, timeout)
+        length = len(seq)
+        starts = {name: 0 for name in active}
+        for pos in range(length + 1):
+            for name in sorted(self.candidates(seq, pos, active), key = order.get):
+                pattern = self.patterns[name]
+                if starts[name] > pos or length - pos < pattern.min: continue
+                found = None
+                for found in pattern.match_ctx(seq[pos:], 0, ctx): break
+                if found is None: continue
+                match = found.shift(pos)
+                starts[name] = match.end if match.end > pos else pos + 1
+                yield name, match
+
+    def findall(self, seq, packrat = True, steps = None, timeout = None):
+        return list(self.finditer(seq, packrat, steps, timeout))
+
+    # Имена шаблонов, совпавших хотя бы раз.
+    def test(self, seq, packrat = True, steps = None, timeout = None):
+        return set(name for name, _ in self.finditer(seq, packrat, steps, timeout))
+
+    # Шаблоны, которые могут начаться со слова pos.
+    def candidates(self, seq, pos, active):
+        names = set(name for name in self.__general if name in active)
+        if pos >= len(seq): return names
+        text = seq[pos].text
+        names.update(name for name in self.__by_word.get(text, ()) if name in active)
+        if self.__by_lexeme:
+            normalized = Word.normalize(text)
+            # Слово не из словаря может оказаться формой любой лексемы.
+            lexemes    = self.__by_form.get(normalized, ()) if Word.is_known(normalized) else self.__by_lexeme
+            names.update(name for name in lexemes if name in active)
+        return names
@@ -0,0 +1,179 @@
+from itertools import product
+from .seq import Seq
+from .word import Word
+from .constants import ANY
+from .patterns import PatternUnit, PatternUnits, PatternWord, PatternLexeme, PatternAny, PatternAll, \
+    PatternSeq, PatternRepeat, PatternSame, PatternNamed
+
+
+# Статический анализ дерева шаблонов и быстрая проверка предложений до морфологического разбора.
+#
+# Атом - условие на одно слово, которое проверяется по строке: (WORD, текст) - слово совпадает
+# с текстом, (LEXEME, нормальная форма) - слово является формой лексемы. Граммемы по строке
+# не проверить, поэтому PatternUnit атомов не даёт и ничего не требует. Если разборы уже известны
+# (см. index), grammemes = True добавляет атомы (GRAMMEME, граммема): граммема есть в одном из вариантов слова.
+#
+# required - условия, обязательные для любого совпадения: список дизъюнктов (множеств атомов),
+# в каждом из которых должен выполниться хотя бы один атом на каком-нибудь слове предложения.
+# first - атомы, один из которых выполняется на первом слове любого непустого совпадения,
+# или None, если первое слово ничем не ограничено.
+#
+# Проверка консервативна: предложение отбрасывается, только если шаблон в нём точно не найдётся.
+# Слова, которых нет в словаре, могут оказаться формой любой лексемы.
+
+WORD, LEXEME, GRAMMEME = 'word', 'lexeme', 'grammeme'
+
+
+# Может ли шаблон совпасть с пустой последовательностью. Для неизвестных шаблонов - да.
+def nullable(pattern):
+    if isinstance(pattern, (PatternUnit, PatternUnits, PatternWord, PatternLexeme)): return False
+    if isinstance(pattern, (PatternAny, PatternAll)): return any(nullable(p) for p in pattern.patterns)
+    if isinstance(pattern, PatternSeq): return all(nullable(p) for p in pattern.parts)
+    if isinstance(pattern, PatternRepeat): return pattern.min_repeats == 0 or nullable(pattern.sub)
+    if isinstance(pattern, (PatternSame, PatternNamed)): return nullable(pattern.sub)
+    return True
+
+
+def first(pattern, grammemes = False):
+    if isinstance(pattern, PatternUnit):
+        if not grammemes or pattern.grammeme == ANY: return None
+        return frozenset([(GRAMMEME, pattern.grammeme)])
+    if isinstance(pattern, PatternUnits):
+        if not grammemes: return None
+        return frozenset([(GRAMMEME, pattern.grammemes[0])])
+    if isinstance(pattern, PatternWord): return frozenset([(WORD, pattern.word)])
+    if isinstance(pattern, PatternLexeme): return frozenset([(LEXEME, pattern.normal_form)])
+    if isinstance(pattern, PatternAny): return union(first(p, grammemes) for p in pattern.patterns)
+    # Все шаблоны PatternAll начинаются с одного слова, достаточно условия любого из них.
+    if isinstance(pattern, PatternAll):
+        atoms = [a for a in (first(p, grammemes) for p in pattern.patterns) if a is not None]
+        return min(atoms, key = len) if atoms else None
+    if isinstance(pattern, PatternSeq):
+        parts = []
+        for part in pattern.parts:
+            parts.append(part)
+            if not nullable(part): break
+        return union(first(p, grammemes) for p in parts)
+    if isinstance(pattern, PatternRepeat):
+        if pattern.max_repeats == 0: return frozenset()
+        return first(pattern.sub, grammemes)
+    if isinstance(pattern, (PatternSame, PatternNamed)): return first(pattern.sub, grammemes)
+    return None
+
+
+def union(atoms):
+    result = frozenset()
+    for atoms_ in atoms:
+        if atoms_ is None: return None
+        result |= atoms_
+    return result
+
+
+# Дизъюнкция PatternAny раскрывается в произведение условий вариантов, пока их не больше limit;
+# иначе от каждого варианта берётся одно условие, и их объединение - одно более слабое условие.
+def required(pattern, limit = 16, grammemes = False):
+    if isinstance(pattern, PatternUnit):
+        if not grammemes or pattern.grammeme == ANY: return []
+        return [frozenset([(GRAMMEME, pattern.grammeme)])]
+    if isinstance(pattern, PatternUnits):
+        if not grammemes: return []
+        return [frozenset([(GRAMMEME, grammeme)]) for grammeme in pattern.grammemes]
+    if isinstance(pattern, PatternWord): return [frozenset([(WORD, pattern.word)])]
+    if isinstance(pattern, PatternLexeme): return [frozenset([(LEXEME, pattern.normal_form)])]
+    if isinstance(pattern, PatternAny):
+        options = [required(p, limit, grammemes) for p in pattern.patterns]
+        if not all(options): return []
+        size = 1
+        for clauses in options: size *= len(clauses)
+        if size > limit: return [frozenset().union(*(clauses[0] for clauses in options))]
+        return dedupe(frozenset().union(*clauses) for clauses in product(*options))
+    if isinstance(pattern, PatternAll):
+        return dedupe(c for p in pattern.patterns for c in required(p, limit, grammemes))
+    if isinstance(pattern, PatternSeq):
+        return dedupe(c for p in pattern.parts for c in required(p, limit, grammemes))
+    if isinstance(pattern, PatternRepeat):
+        if pattern.min_repeats == 0 or pattern.max_repeats == 0: return []
+        return required(pattern.sub, limit, grammemes)
+    if isinstance(pattern, (PatternSame, PatternNamed)): return required(pattern.sub, limit, grammemes)
+    return []
+
+
+def dedupe(clauses):
+    result = []
+    for clause in clauses:
+        if clause not in result: result.append(clause)
+    return result
+
+
+# Строки слов предложения и проверка атомов по ним.
+class Tokens(object):
+    __slots__ = ('texts', '__normalized', '__unknown')
+
+    def __init__(self, texts):
+        self.texts        = texts
+        self.__normalized = None
+        self.__unknown    = None
+
+    @staticmethod
+    def of(seq):
+        if type(seq) == str: return Tokens(Seq.tokenize(seq))
+        return Tokens([w.text for w in seq])
+
+    @property
+    def normalized(self):
+        if self.__normalized is None: self.__normalized = [Word.normalize(t) for t in self.texts]
+        return self.__normalized
+
+    # Есть ли в предложении слово не из словаря.
+    @property
+    def unknown(self):
+        if self.__unknown is None: self.__unknown = not all(Word.is_known(t) for t in set(self.normalized))
+        return self.__unknown
+
+    def holds(self, atom):
+        kind, arg = atom
+        if kind == WORD: return arg in self.texts
+        forms = Word.lexeme_forms(arg)
+        return any(t in forms for t in self.normalized) or self.unknown
+
+    def holds_at(self, atom, ix):
+        kind, arg = atom
+        if kind == WORD: return self.texts[ix] == arg
+        text = self.normalized[ix]
+        return text in Word.lexeme_forms(arg) or not Word.is_known(text)
+
+
+class Prefilter(object):
+    __slots__ = ('pattern', 'clauses', 'first', 'nullable')
+
+    def __init__(self, pattern):
+        self.pattern  = pattern
+        # Сначала проверяются точные слова: это поиск строки без обращения к словарю.
+        self.clauses  = sorted(required(pattern), key = lambda c: any(kind == LEXEME for kind, _ in c))
+        self.first    = first(pattern)
+        self.nullable = nullable(pattern)
+
+    # Может ли шаблон найтись в предложении (Seq или строке).
+    def accepts(self, seq):
+        tokens = Tokens.of(seq)
+        return all(any(tokens.holds(atom) for atom in clause) for clause in self.clauses)
+
+    # Номера слов, с которых может начинаться непустое совпадение.
+    def starts(self, seq):
+        tokens = Tokens.of(seq)
+        if self.nullable or self.first is None: return list(range(len(tokens.texts)))
+        return [ix for ix in range(len(tokens.texts)) if any(tokens.holds_at(atom, ix) for atom in self.first)]
+
+    # Тексты, в которых шаблон может найтись.
+    def filter(self, texts):
+        return (text for text in texts if self.accepts(text))
+
+    def search(self, seq, packrat = False, steps = None, timeout = None):
+        if type(seq) == str: seq = Seq(seq)
+        if not self.accepts(seq): return None
+        return self.pattern.search(seq, packrat, steps, timeout)
+
+    def findall(self, seq, packrat = False, steps = None, timeout = None):
+        if type(seq) == str: seq = Seq(seq)
+        if not self.accepts(seq): return []
+        return self.pattern.findall(seq, packrat, steps, timeout)
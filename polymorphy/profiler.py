@@ -0,0 +1,235 @@
+import json
+from collections import namedtuple
+from time import perf_counter
+from .patterns import GREEDY
+
+
+# Событие трассировки узла: call - вход в узел на срезе offset длиной length, match - очередное
+# совпадение длиной length, redo - родитель вернулся за следующим совпадением (возврат),
+# done - перебор узла закончен. lvl - глубина узла в дереве перебора, time - время perf_counter.
+# offset - номер слова в списке слов среза (см. Seq.key).
+TraceEvent = namedtuple('TraceEvent', ['event', 'lvl', 'pattern', 'offset', 'length', 'time'])
+
+
+# Статистика узла шаблона: calls - входы в узел, matches - отданные совпадения,
+# backtracks - возвраты за следующим совпадением, failures - входы без единого совпадения,
+# time - время перебора узла вместе с вложенными узлами, own - без вложенных (секунды).
+class NodeStats(object):
+    __slots__ = ('pattern', 'calls', 'matches', 'backtracks', 'failures', 'time', 'own')
+
+    def __init__(self, pattern):
+        self.pattern    = pattern
+        self.calls      = 0
+        self.matches    = 0
+        self.backtracks = 0
+        self.failures   = 0
+        self.time       = 0.0
+        self.own        = 0.0
+
+    def __repr__(self):
+        return 'NodeStats(%s calls=%d matches=%d backtracks=%d failures=%d time=%.6f own=%.6f)' % (
+            Profile.describe(self.pattern), self.calls, self.matches, self.backtracks, self.failures, self.time, self.own,
+        )
+
+
+# Профиль сопоставления: статистика по узлам шаблона и, при trace = True, трассировка событий.
+# Передаётся в match/test/search/finditer/findall (profile = ...) и накапливается между вызовами.
+# Без профиля перебор идёт как обычно: контекст сопоставления выбирается без профиля (см. patterns.MatchContext),
+# узлы не оборачиваются, время не измеряется и наличие профиля при переборе не проверяется.
+#
+#   profile = Profile()
+#   rule    = dsl.source('seq { repeat { ADJF } NOUN }')
+#   rule.pattern.findall(seq, profile = profile)
+#   print(profile.report(rule))
+class Profile(object):
+    __slots__ = ('stats', 'trace', 'events', '__stack', '__active')
+
+    def __init__(self, trace = False):
+        self.stats    = {}
+        self.trace    = trace
+        self.events   = []
+        self.__stack  = []
+        self.__active = {}
+
+    def get(self, pattern):
+        return self.stats.get(id(pattern))
+
+    def clear(self):
+        self.stats.clear()
+        del self.events[:]
+
+    # Оборачивает перебор узла: считает входы, совпадения и возвраты и измеряет время каждого шага.
+    # Время вложенных узлов, которые выполняются внутри шага, копится в стеке и вычитается из own.
+    # В time узла, который перебирается рекурсивно (повтор через rest), входит только внешний шаг,
+    # чтобы время вложенных вызовов не считалось дважды.
+    def wrap(self, pattern, seq, lvl, gen):
+        stats = self.enter(pattern, seq, lvl)
+        found = 0
+        while True:
+            start = self.resume(stats)
+            try:
+                match = next(gen, None)
+            finally:
+                self.suspend(stats, start)
+            if match is None: break
+            found += 1
+            self.matched(stats, lvl, seq, match)
+            yield match
+            self.redo(stats, lvl, seq)
+        self.leave(stats, lvl, seq, found)
+
+    # Шаги wrap по отдельности: перебор на явном стеке (см. iterative.ProfileFrame) вызывает их сам.
+    # Вход в узел; возвращает статистику узла.
+    def enter(self, pattern, seq, lvl):
+        key   = id(pattern)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = NodeStats(pattern)
+            self.stats[key] = stats
+        stats.calls += 1
+        if self.trace: self.events.append(TraceEvent('call', lvl, pattern, seq.key[1], len(seq), perf_counter()))
+        return stats
+
+    # Начало шага перебора узла; возвращает время начала шага для suspend.
+    def resume(self, stats):
+        key    = id(stats.pattern)
+        active = self.__active
+        self.__stack.append(0.0)
+        active[key] = active.get(key, 0) + 1
+        return perf_counter()
+
+    # Конец шага перебора узла, начатого resume.
+    def suspend(self, stats, start):
+        elapsed     = perf_counter() - start
+        key         = id(stats.pattern)
+        stack       = self.__stack
+        active      = self.__active
+        nested      = stack.pop()
+        active[key] -= 1
+        if not active[key]: stats.time += elapsed
+        stats.own  += elapsed - nested
+        if stack: stack[-1] += elapsed
+
+    def matched(self, stats, lvl, seq, match):
+        stats.matches += 1
+        if self.trace: self.events.append(TraceEvent('match', lvl, stats.pattern, seq.key[1], match.end - match.start, perf_counter()))
+
+    def redo(self, stats, lvl, seq):
+        stats.backtracks += 1
+        if self.trace: self.events.append(TraceEvent('redo', lvl, stats.pattern, seq.key[1], len(seq), perf_counter()))
+
+    # Перебор узла закончен; found - число отданных совпадений.
+    def leave(self, stats, lvl, seq, found):
+        if not found: stats.failures += 1
+        if self.trace: self.events.append(TraceEvent('done', lvl, stats.pattern, seq.key[1], found, perf_counter()))
+
+    # Отчёт по узлам. Если передан корень шаблона или dsl.Source, узлы печатаются деревом
+    # с фрагментами исходного текста правила; иначе - списком по убыванию времени.
+    # Внутренние узлы (rest в PatternSeq, PatternAll и PatternRepeat) учитываются вместе с узлом-владельцем.
+    def report(self, root = None, source = None):
+        if root is not None and hasattr(root, 'pattern') and hasattr(root, 'spans'):
+            source = root
+            root   = source.pattern
+        if root is None and source is not None: root = source.pattern
+
+        header = '%8s %8s %8s %8s %10s %10s  %s' % ('calls', 'matches', 'redo', 'fail', 'time ms', 'own ms', 'node')
+        lines  = [header]
+        def line(indent, pattern, stats):
+            label = Profile.label(pattern, source)
+            lines.append('%8d %8d %8d %8d %10.3f %10.3f  %s%s' % (
+                stats.calls, stats.matches, stats.backtracks, stats.failures,
+                stats.time * 1000, stats.own * 1000, '  ' * indent, label,
+            ))
+
+        if root is None:
+            for stats in sorted(self.stats.values(), key = lambda s: s.time, reverse = True):
+                line(0, stats.pattern, stats)
+            return '\n'.join(lines)
+
+        seen  = set()
+        stack = [(root, 0)]
+        while stack:
+            pattern, indent = stack.pop()
+            if id(pattern) in seen: continue
+            seen.add(id(pattern))
+            line(indent, pattern, self.folded(pattern))
+            for child in reversed(Profile.children(pattern)): stack.append((child, indent + 1))
+        return '\n'.join(lines)
+
+    # Статистика узла вместе с его внутренними узлами rest; time - время самого узла.
+    # Узел rest перебирается только внутри своего владельца, поэтому цепочка обрывается на первом невызванном.
+    def folded(self, pattern):
+        total = NodeStats(pattern)
+        own   = self.get(pattern)
+        if own is not None: total.time = own.time
+        seen  = set()
+        node  = pattern
+        while node is not None and id(node) not in seen:
+            seen.add(id(node))
+            stats = self.get(node)
+            if stats is None: break
+            total.calls      += stats.calls
+            total.matches    += stats.matches
+            total.backtracks += stats.backtracks
+            total.failures   += stats.failures
+            total.own        += stats.own
+            node = getattr(node, 'rest', None)
+        return total
+
+    # Статистика и трассировка в виде, пригодном для json: узлы нумеруются, события ссылаются на номер узла.
+    def export(self, source = None):
+        ids   = {}
+        nodes = []
+        for key, stats in self.stats.items():
+            ids[key] = len(nodes)
+            nodes.append({
+                'id':         len(nodes),
+                'node':       Profile.label(stats.pattern, source),
+                'calls':      stats.calls,
+                'matches':    stats.matches,
+                'backtracks': stats.backtracks,
+                'failures':   stats.failures,
+                'time':       stats.time,
+                'own':        stats.own,
+            })
+        events = [
+            {'event': e.event, 'lvl': e.lvl, 'node': ids[id(e.pattern)], 'offset': e.offset, 'length': e.length, 'time': e.time}
+            for e in self.events
+        ]
+        return {'nodes': nodes, 'events': events}
+
+    def dump(self, path, source = None):
+        with open(path, 'w') as file:
+            json.dump(self.export(source), file, ensure_ascii = False, indent = 2)
+
+    # Фрагмент правила DSL, из которого построен узел, или краткое описание узла.
+    @staticmethod
+    def label(pattern, source = None):
+        if source is not None:
+            snippet = source.snippet(pattern)
+            if snippet is not None: return snippet
+        return Profile.describe(pattern)
+
+    @staticmethod
+    def describe(pattern):
+        name = type(pattern).__name__
+        if name.startswith('Pattern'): name = name[len('Pattern'):]
+        if hasattr(pattern, 'grammeme'): return name + '(' + pattern.grammeme + ')'
+        if hasattr(pattern, 'grammemes'): return name + '(' + ' '.join(pattern.grammemes) + ')'
+        if hasattr(pattern, 'word'): return name + '(' + repr(pattern.word) + ')'
+        if hasattr(pattern, 'normal_form'): return name + '(' + repr(pattern.normal_form) + ')'
+        if hasattr(pattern, 'name'): return name + '(' + pattern.name + ')'
+        if hasattr(pattern, 'min_repeats'):
+            mode = getattr(pattern, 'mode', GREEDY)
+            return name + '(' + str(pattern.min_repeats) + ':' + ('' if pattern.max_repeats is None else str(pattern.max_repeats)) + \
+                ('' if mode == GREEDY else ' ' + mode) + ')'
+        return name + '/' + str(len(Profile.children(pattern)))
+
+    # Вложенные шаблоны узла в порядке записи.
+    @staticmethod
+    def children(pattern):
+        if hasattr(pattern, 'parts'): return list(pattern.parts)
+        if hasattr(pattern, 'patterns'): return list(pattern.patterns)
+        if hasattr(pattern, 'sub'): return [pattern.sub]
+        return []
+
@@ -1,49 +1,63 @@
 import re
 from .constants import ANY, ADVB, NPRO, PRED, PREP, CONJ, PRCL, INTJ
+from .masks import grammeme_mask
 from .word import Word
 
 
 # Предложение - последовательность слов.
+# Срез предложения не копирует список слов, а ссылается на общий список с границами start:stop.
+# Свойство words возвращает копию слов среза.
 class Seq(object):
-    __slots__ = ('__text', 'words')
+    __slots__ = ('__text', '__words', '__start', '__stop')
 
     __spaces_pattern = re.compile(r'[\s]+')
     __noinflect = [ADVB, PRED, PREP, CONJ, PRCL, INTJ]
+    __noinflect_mask = grammeme_mask(*__noinflect)
 
-    def __init__(self, text = '', threshold = 0):
-        self.__text = None
-        self.words  = [Word(w, threshold = threshold) for w in Seq.__spaces_pattern.split(text) if len(w)]
+    # backend - анализатор слов предложения, None - общий (см. Word.default_backend).
+    def __init__(self, text = '', threshold = 0, backend = None):
+        self.__text  = None
+        self.__words = [Word(w, threshold, backend = backend) for w in Seq.tokenize(text)]
+        self.__start = 0
+        self.__stop  = len(self.__words)
 
     def __eq__(self, other):
         if not isinstance(other, Seq): return False
-        return self.words == other.words
+        if len(self) != len(other): return False
+        return all(w1 == w2 for w1, w2 in zip(self, other))
 
     def __hash__(self):
-        return hash(tuple(self.words))
+        return hash(tuple(self))
 
     def __bool__(self):
-        return len(self.words) > 0
+        return self.__stop > self.__start
+
+    # Сериализуются только слова среза; общие объекты Word pickle записывает один раз.
+    def __reduce__(self):
+        return (Seq.from_words, (list(self),))
 
     def __iter__(self):
-        return (w for w in self.words)
+        words = self.__words
+        return (words[i] for i in range(self.__start, self.__stop))
 
     def __len__(self):
-        return len(self.words)
+        return self.__stop - self.__start
 
     def __contains__(self, item):
-        return any(w.text == item for w in self.words)
+        return any(w.text == item for w in self)
 
     def __getitem__(self, ix):
-        if type(ix) == int: return self.words[ix]
-        return Seq.from_words(self.words[ix])
+        if type(ix) == int: return self.__words[range(self.__start, self.__stop)[ix]]
+        ixs = range(self.__start, self.__stop)[ix]
+        if ixs.step != 1: return Seq.from_words([self.__words[i] for i in ixs])
+        return Seq.view(self.__words, ixs.start, max(ixs.start, ixs.stop))
 
     def __add__(self, other):
         if not other: return self
         if type(other) == str: other = Seq(other)
         if not self: return other
-        words = []
-        for word in self.words:  words.append(word)
-        for word in other.words: words.append(word)
+        words = list(self)
+        words.extend(other)
         return Seq.from_words(words)
 
     def __radd__(self, other):
@@ -52,18 +66,65 @@ class Seq(object):
         return other + self
 
     def __repr__(self):
-        return 'Seq(' + ' '.join(w.__repr__() for w in self.words) + ')'
+        return 'Seq(' + ' '.join(w.__repr__() for w in self) + ')'
 
     @property
     def text(self):
-        if self.__text is None: self.__text = ' '.join(w.text for w in self.words)
+        if self.__text is None: self.__text = ' '.join(w.text for w in self)
         return self.__text
 
+    # Ключ среза: общий список слов и границы. Срезы с одинаковым ключом состоят из одних и тех же слов.
+    @property
+    def key(self):
+        return (id(self.__words), self.__start, self.__stop)
+
+    # Новый список слов среза; срез при этом не меняется, и изменения списка на предложение не влияют.
+    @property
+    def words(self):
+        return self.__words[self.__start:self.__stop]
+
     @staticmethod
     def from_words(words):
-        seq        = Seq.__new__(Seq)
-        seq.__text = None
-        seq.words  = words
+        return Seq.view(words, 0, len(words))
+
+    # Разбивает текст на слова по пробельным символам.
+    @staticmethod
+    def tokenize(text):
+        return [w for w in Seq.__spaces_pattern.split(text) if len(w)]
+
+    # Строит предложения для набора текстов.
+    # Каждая различная словоформа разбирается один раз (одним вызовом parse_many анализатора),
+    # а её Word разделяется всеми предложениями.
+    @staticmethod
+    def batch(texts, threshold = 0, backend = None):
+        tokenized = [Seq.tokenize(text) for text in texts]
+        words     = {}
+        for tokens in tokenized:
+            for token in tokens:
+                if token not in words: words[token] = Word(token, threshold, backend = backend)
+        Word.analyze_many(list(words), threshold, backend)
+        for word in words.values(): word.variants
+        return [Seq.from_words([words[token] for token in tokens]) for tokens in tokenized]
+
+    # Лениво строит предложения из потока строк, обрабатывая их пачками по chunksize с помощью batch.
+    @staticmethod
+    def iter_from(lines, threshold = 0, chunksize = 1000, backend = None):
+        chunk = []
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) >= chunksize:
+                yield from Seq.batch(chunk, threshold, backend)
+                chunk = []
+        if chunk: yield from Seq.batch(chunk, threshold, backend)
+
+    # Возвращает предложение-срез words[start:stop] без копирования списка.
+    @staticmethod
+    def view(words, start, stop):
+        seq         = Seq.__new__(Seq)
+        seq.__text  = None
+        seq.__words = words
+        seq.__start = start
+        seq.__stop  = stop
         return seq
 
     # Возвращает копию предложения, в которой все варианты слов содержат указанную граммему.
@@ -71,7 +132,7 @@ class Seq(object):
     def constrain(self, grammeme):
         if grammeme == ANY: return self
         words = []
-        for word in self.words:
+        for word in self:
             word = word.constrain(grammeme)
             if word is None: return None
             words.append(word)
@@ -79,9 +140,10 @@ class Seq(object):
 
     # Возвращает часть последовательности, ограниченную по граммеме
     def constrain_find(self, grammeme, max = None):
-        if max is None: max = len(self.words)
+        if max is None: max = len(self)
+        if grammeme == ANY: return self[:max + 1]
         words = []
-        for word in self.words:
+        for word in self:
             if len(words) > max: break
             word = word.constrain(grammeme)
             if word is None: break
@@ -93,13 +155,14 @@ class Seq(object):
     # Возвращает None если хотя бы одно слово не получилось склонить.
     def inflect(self, grammemes, hard = False):
         words = []
-        for word in self.words:
+        for word in self:
             inflected = word.inflect(grammemes)
             if inflected:
                 words.append(inflected)
                 continue
 
-            if not hard:
+            # Слова, у которых нет ни одной несклоняемой части речи, отбрасываются по маске слова.
+            if not hard and word.mask & Seq.__noinflect_mask:
                 constrained = None
                 for grammeme in Seq.__noinflect:
                     constrained = word.constrain(grammeme)
@@ -0,0 +1,253 @@
+import mmap
+import struct
+from array import array
+from collections import namedtuple
+from .cache import LRUCache
+from .masks import grammemes, register, tag_mask
+from .seq import Seq
+from .word import Word
+
+
+# Тег варианта из хранилища: строка тега pymorphy2 и множество граммем grammemes.
+# Строится без анализатора; str(tag) и "граммема in tag" работают как у OpencorporaTag.
+class Tag(object):
+    __slots__ = ('string', 'grammemes')
+
+    def __init__(self, string, grammemes):
+        self.string    = string
+        self.grammemes = frozenset(grammemes)
+
+    def __str__(self):
+        return self.string
+
+    def __repr__(self):
+        return 'Tag(' + repr(self.string) + ')'
+
+    def __contains__(self, grammeme):
+        return grammeme in self.grammemes
+
+    def __eq__(self, other):
+        return str(self) == str(other)
+
+    def __hash__(self):
+        return hash(self.string)
+
+
+# Вариант разбора из хранилища: те же поля, что у pymorphy2 Parse, кроме methods_stack.
+# Склонение строится по полному разбору словоформы, который находится через Word.analyze.
+class Variant(namedtuple('Variant', ['word', 'tag', 'normal_form', 'score'])):
+    __slots__ = ()
+
+    def inflect(self, grammemes):
+        tag = str(self.tag)
+        for parsed in Word.analyze(self.word):
+            if str(parsed.tag) == tag and parsed.normal_form == self.normal_form: return parsed.inflect(grammemes)
+        return None
+
+
+# Хранилище заранее вычисленных разборов словоформ корпуса.
+#
+# Файл состоит из столбцов, которые читаются прямо из отображённой в память страницы без загрузки:
+#   строки          - смещения (uint32) и байты UTF-8 всех строк: словоформ, нормальных форм и тегов;
+#   словоформы      - номера строк (uint32), отсортированные по байтам строки, - поиск делением пополам;
+#   начала разборов - для каждой словоформы номер первого варианта (uint32), плюс общее число вариантов;
+#   варианты        - слово, нормальная форма (номера строк), номер тега (uint32);
+#   граммемы        - номера строк всех граммем в порядке битов процесса, построившего хранилище (см. masks);
+#   теги            - номер строки тега, начало его граммем (uint32), плюс общее число граммем тегов;
+#   граммемы тегов  - номера граммем (uint32);
+#   оценки          - оценки вариантов (float64, выровнены по 8 байт).
+# Числа записываются в порядке байтов машины, на которой построено хранилище.
+#
+# При открытии хранилища таблица граммем из файла регистрируется в masks, а теги строятся
+# из сохранённых граммем (см. Tag), поэтому чтение разборов и сопоставление шаблонов
+# не загружают словари анализатора. Процессы, открывшие один файл, разделяют его страницы,
+# а анализатор нужен только для словоформ, которых в хранилище нет, и для inflect.
+class AnalysisStore(object):
+    __slots__ = (
+        'path', 'words', '__file', '__map', '__strings', '__offsets', '__forms',
+        '__starts', '__variant_words', '__normal_forms', '__tags', '__scores', '__tag_cache',
+        '__grammemes', '__tag_strings', '__tag_starts', '__tag_grammemes',
+    )
+
+    magic  = b'PMST0002'
+    header = struct.Struct('<8sIIIIIII')
+
+    def __init__(self, path, cache_size = 65536):
+        self.path   = path
+        self.words  = LRUCache(cache_size)
+        self.__file = open(path, 'rb')
+        self.__map  = mmap.mmap(self.__file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, strings, blob, forms, variants, grammeme_count, tags, tag_grammemes = \
+            AnalysisStore.header.unpack_from(self.__map, 0)
+        if magic != AnalysisStore.magic:
+            self.__map.close()
+            self.__file.close()
+            raise ValueError('Not an analysis store: ' + path)
+
+        view = memoryview(self.__map)
+        pos  = AnalysisStore.header.size
+        def column(count, code, size = 4):
+            nonlocal pos
+            data = view[pos:pos + count * size].cast(code)
+            pos += count * size
+            return data
+
+        self.__offsets       = column(strings + 1, 'I')
+        self.__strings       = view[pos:pos + blob]
+        pos                 += blob
+        self.__forms         = column(forms, 'I')
+        self.__starts        = column(forms + 1, 'I')
+        self.__variant_words = column(variants, 'I')
+        self.__normal_forms  = column(variants, 'I')
+        self.__tags          = column(variants, 'I')
+        self.__grammemes     = column(grammeme_count, 'I')
+        self.__tag_strings   = column(tags, 'I')
+        self.__tag_starts    = column(tags + 1, 'I')
+        self.__tag_grammemes = column(tag_grammemes, 'I')
+        pos                 += -pos % 8
+        self.__scores        = column(variants, 'd', 8)
+        self.__tag_cache     = {}
+        register([self.string(ix) for ix in self.__grammemes])
+
+    def __len__(self):
+        return len(self.__forms)
+
+    def __contains__(self, text):
+        return self.find(text) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for column in (
+            self.__offsets, self.__strings, self.__forms, self.__starts,
+            self.__variant_words, self.__normal_forms, self.__tags, self.__scores,
+            self.__grammemes, self.__tag_strings, self.__tag_starts, self.__tag_grammemes,
+        ): column.release()
+        self.__map.close()
+        self.__file.close()
+
+    def string(self, ix):
+        return str(self.__strings[self.__offsets[ix]:self.__offsets[ix + 1]], 'utf-8')
+
+    # Тег с номером ix из таблицы тегов хранилища.
+    def tag(self, ix):
+        tag = self.__tag_cache.get(ix)
+        if tag is None:
+            tag = Tag(self.string(self.__tag_strings[ix]), [
+                self.string(self.__grammemes[self.__tag_grammemes[i]])
+                for i in range(self.__tag_starts[ix], self.__tag_starts[ix + 1])
+            ])
+            self.__tag_cache[ix] = tag
+        return tag
+
+    # Номер словоформы в хранилище или None.
+    def find(self, text):
+        key   = text.encode('utf-8')
+        forms = self.__forms
+        lo    = 0
+        hi    = len(forms)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            ix  = forms[mid]
+            if self.__strings[self.__offsets[ix]:self.__offsets[ix + 1]].tobytes() < key: lo = mid + 1
+            else: hi = mid
+        if lo < len(forms) and self.string(forms[lo]) == text: return lo
+        return None
+
+    # Варианты разбора словоформы из хранилища или None, если словоформы в нём нет.
+    def variants(self, text):
+        form = self.find(text)
+        if form is None: return None
+        return [
+            Variant(self.string(self.__variant_words[i]), self.tag(self.__tags[i]),
+                    self.string(self.__normal_forms[i]), self.__scores[i])
+            for i in range(self.__starts[form], self.__starts[form + 1])
+        ]
+
+    # Слово с вариантами из хранилища; словоформы не из хранилища разбираются как обычно.
+    # Слова с одинаковым текстом и порогом разделяются, как в Seq.batch.
+    def word(self, text, threshold = 0):
+        key  = (text, threshold)
+        word = self.words.get(key)
+        if word is None:
+            variants = self.variants(text)
+            word     = Word(text, threshold) if variants is None else Word(text, threshold, variants)
+            self.words.put(key, word)
+        return word
+
+    def seq(self, text, threshold = 0):
+        return Seq.from_words([self.word(token, threshold) for token in Seq.tokenize(text)])
+
+    def iter_from(self, lines, threshold = 0):
+        for line in lines: yield self.seq(line, threshold)
+
+    # Разбирает все словоформы текстов и записывает хранилище в path.
+    @staticmethod
+    def build(path, texts):
+        forms = set()
+        for text in texts: forms.update(Seq.tokenize(text))
+
+        strings = {}
+        def intern(string):
+            if string not in strings: strings[string] = len(strings)
+            return strings[string]
+
+        forms         = sorted(forms, key = lambda f: f.encode('utf-8'))
+        form_ids      = [intern(form) for form in forms]
+        starts        = array('I', [0])
+        variant_words = array('I')
+        normal_forms  = array('I')
+        tags          = array('I')
+        scores        = array('d')
+        tag_ids       = {}
+        tag_list      = []
+        for form in forms:
+            for variant in Word.analyze(form):
+                string = str(variant.tag)
+                if string not in tag_ids:
+                    tag_mask(variant.tag)
+                    tag_ids[string] = len(tag_list)
+                    tag_list.append(variant.tag)
+                variant_words.append(intern(variant.word))
+                normal_forms.append(intern(variant.normal_form))
+                tags.append(tag_ids[string])
+                scores.append(variant.score)
+            starts.append(len(variant_words))
+
+        # Таблица граммем читается после разбора: теги могли добавить в неё новые граммемы.
+        order         = grammemes()
+        bits          = dict((grammeme, i) for i, grammeme in enumerate(order))
+        grammeme_ids  = array('I', [intern(grammeme) for grammeme in order])
+        tag_strings   = array('I')
+        tag_starts    = array('I', [0])
+        tag_grammemes = array('I')
+        for tag in tag_list:
+            tag_strings.append(intern(str(tag)))
+            tag_grammemes.extend(sorted(bits[grammeme] for grammeme in tag.grammemes))
+            tag_starts.append(len(tag_grammemes))
+
+        blob    = bytearray()
+        offsets = array('I', [0])
+        for string in strings:
+            blob.extend(string.encode('utf-8'))
+            offsets.append(len(blob))
+        # Столбцы чисел выравниваются по 4 байта.
+        blob.extend(b'\0' * (-len(blob) % 4))
+
+        with open(path, 'wb') as file:
+            file.write(AnalysisStore.header.pack(
+                AnalysisStore.magic, len(strings), len(blob), len(form_ids), len(variant_words),
+                len(grammeme_ids), len(tag_strings), len(tag_grammemes),
+            ))
+            for column in (
+                offsets, blob, array('I', form_ids), starts, variant_words, normal_forms, tags,
+                grammeme_ids, tag_strings, tag_starts, tag_grammemes,
+            ):
+                file.write(column if isinstance(column, bytearray) else column.tobytes())
+            file.write(b'\0' * (-file.tell() % 8))
+            file.write(scores.tobytes())
+        return len(form_ids)
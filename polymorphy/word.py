@@ -1,24 +1,135 @@
-import pymorphy2
+from .backend import Pymorphy2Backend
+from .cache import LRUCache
 from .constants import ANY, ABSTRACT_GRAMMEMES, POS
+from .masks import grammeme_mask, tag_mask
 
 
-# Слово представляет строку + набор вариантов его интерпретации с помощью pymorphy2.MorphAnalyzer.
+# Слово представляет строку + набор вариантов его интерпретации морфологическим анализатором (см. backend).
+# Для каждого варианта хранится битовая маска граммем его тега (см. masks).
+# Результаты constrain запоминаются в слове: при переборе с возвратами одно и то же слово
+# многократно ограничивается одними и теми же граммемами.
+#
+# backend - анализатор слова; None - общий анализатор (default_backend). По умолчанию это pymorphy2,
+# который загружает словари при первом разборе (секунды и сотни мегабайт).
+# Его можно заменить своим или общим экземпляром с помощью set_backend или set_morph.
 class Word(object):
-    __slots__ = ('text', 'threshold', '__variants')
+    __slots__ = ('text', 'threshold', 'backend', '__variants', '__masks', '__mask', '__constrained')
 
-    __morph = pymorphy2.MorphAnalyzer()
+    __backend = None
 
-    def __init__(self, text, threshold = 0, variants = None):
+    # Абстрактные граммемы нумеруются без словаря, см. masks.
+    __pos_mask = grammeme_mask(*ABSTRACT_GRAMMEMES[POS])
+
+    # Сколько результатов constrain хранит одно слово.
+    constrain_cache_size = 32
+
+    # Общий для процесса кэш разборов: (text, threshold, backend) -> список вариантов.
+    cache = LRUCache(65536)
+
+    # Словоформы лексем: нормальная форма -> множество форм (см. lexeme_forms).
+    forms_cache = LRUCache(4096)
+
+    # Результаты inflect: (варианты, граммемы, анализатор) -> слово или None.
+    inflect_cache = LRUCache(16384)
+
+    def __init__(self, text, threshold = 0, variants = None, backend = None):
         self.text       = text
         self.threshold  = threshold
+        self.backend    = backend
         self.__variants = [v for v in variants if v.score > threshold] if variants else None
+        self.__masks    = None
+        self.__mask     = None
+        self.__constrained = None
+
+    @staticmethod
+    def default_backend():
+        if Word.__backend is None: Word.__backend = Pymorphy2Backend()
+        return Word.__backend
+
+    # Подменяет общий анализатор; разборы прежнего анализатора удаляются из кэшей.
+    @staticmethod
+    def set_backend(backend):
+        Word.__backend = backend
+        Word.cache.clear()
+        Word.forms_cache.clear()
+        Word.inflect_cache.clear()
+
+    # Общий анализатор - переданный экземпляр pymorphy2.MorphAnalyzer.
+    @staticmethod
+    def set_morph(morph):
+        Word.set_backend(Pymorphy2Backend(morph))
 
     @property
     def variants(self):
         if self.__variants is None:
-            self.__variants = [v for v in Word.__morph.parse(self.text) if v.score > self.threshold]
+            self.__variants = Word.analyze(self.text, self.threshold, self.backend)
         return self.__variants
 
+    @property
+    def masks(self):
+        if self.__masks is None: self.__masks = [tag_mask(v.tag) for v in self.variants]
+        return self.__masks
+
+    # Граммемы всех вариантов слова, например для быстрой проверки, может ли слово их содержать.
+    @property
+    def mask(self):
+        if self.__mask is None:
+            mask = 0
+            for variant_mask in self.masks: mask |= variant_mask
+            self.__mask = mask
+        return self.__mask
+
+    # Разбирает строку анализатором, оставляя варианты с оценкой выше порога.
+    # Результат кэшируется и разделяется всеми словами с тем же текстом, порогом и анализатором, изменять его нельзя.
+    @staticmethod
+    def analyze(text, threshold = 0, backend = None):
+        if backend is None: backend = Word.default_backend()
+        key      = (text, threshold, backend)
+        variants = Word.cache.get(key)
+        if variants is None:
+            variants = [v for v in backend.parse(text) if v.score > threshold]
+            Word.cache.put(key, variants)
+        return variants
+
+    # Заносит в кэш разборы строк, которых в нём нет, одним вызовом parse_many.
+    @staticmethod
+    def analyze_many(texts, threshold = 0, backend = None):
+        if backend is None: backend = Word.default_backend()
+        missing = [text for text in set(texts) if (text, threshold, backend) not in Word.cache]
+        if not missing: return
+        for text, parsed in zip(missing, backend.parse_many(missing)):
+            Word.cache.put((text, threshold, backend), [v for v in parsed if v.score > threshold])
+
+    # Заранее заполняет кэш разборов, например частыми словами языка.
+    @staticmethod
+    def prewarm(texts, threshold = 0, backend = None):
+        Word.analyze_many(list(texts), threshold, backend)
+
+    # Все словоформы лексем с нормальной формой normal_form (в нижнем регистре, ё заменена на е).
+    # Строится по словарю без разбора предложений, результат кэшируется.
+    @staticmethod
+    def lexeme_forms(normal_form):
+        forms = Word.forms_cache.get(normal_form)
+        if forms is None:
+            forms = set()
+            backend = Word.default_backend()
+            for variant in backend.parse(normal_form):
+                if variant.normal_form != normal_form: continue
+                forms.update(Word.normalize(form.word) for form in backend.lexeme(variant))
+            forms = frozenset(forms)
+            Word.forms_cache.put(normal_form, forms)
+        return forms
+
+    # Есть ли строка в словаре. Разборы словарных слов принадлежат лексемам словаря (см. lexeme_forms),
+    # а у прочих слов нормальная форма угадывается и может быть любой.
+    @staticmethod
+    def is_known(text):
+        return Word.default_backend().word_is_known(Word.normalize(text))
+
+    @staticmethod
+    def normalize(text):
+        return text.lower().replace('ё', 'е')
+
     def __repr__(self):
         if len(self.variants) == 1: return self.text
         else: return self.text + '×' + str(len(self.variants))
@@ -30,40 +141,124 @@ class Word(object):
     def __hash__(self):
         return hash(tuple(self.variants))
 
+    # При сериализации варианты записываются номерами в разборе слова (см. Word.analyze),
+    # а варианты, которых в разборе нет (например, результаты inflect), - словоформой, тегом,
+    # нормальной формой и оценкой. Строка тега общая для всех вариантов с этим тегом,
+    # поэтому pickle записывает её один раз. Анализатор слова сериализуется вместе с ним
+    # (None - общий анализатор процесса-получателя), и варианты восстанавливаются по его разбору.
+    def __reduce__(self):
+        if self.__variants is None: return (Word.restore, (self.text, self.threshold, None, self.backend))
+        parsed   = Word.analyze(self.text, 0, self.backend)
+        variants = []
+        for variant in self.__variants:
+            try:
+                variants.append(parsed.index(variant))
+            except ValueError:
+                variants.append((variant.word, str(variant.tag), variant.normal_form, variant.score))
+        return (Word.restore, (self.text, self.threshold, tuple(variants), self.backend))
+
+    @staticmethod
+    def restore(text, threshold, variants, backend = None):
+        if variants is None: return Word(text, threshold, backend = backend)
+        parsed   = Word.analyze(text, 0, backend)
+        restored = []
+        for variant in variants:
+            if type(variant) == int:
+                restored.append(parsed[variant])
+                continue
+            word, tag, normal_form, score = variant
+            for candidate in Word.analyze(word, 0, backend):
+                if str(candidate.tag) == tag and candidate.normal_form == normal_form:
+                    restored.append(candidate._replace(score = score))
+                    break
+            else:
+                raise ValueError('Cannot restore variant ' + tag + ' of ' + word)
+        return Word(text, threshold, restored, backend)
+
     # Вернуть копию слова, содержащую только подмножество вариантов, содержащих указанную граммему.
     # Возвращает None, если вариантов нет.
     def constrain(self, grammeme):
         if grammeme == ANY: return self
-        variants = [variant for variant in self.variants if grammeme in variant.tag.grammemes]
-        if not len(variants): return None
-        return Word(self.text, variants = variants)
+        return self.constrain_mask(grammeme_mask(grammeme))
+
+    # Вернуть копию слова с вариантами, теги которых содержат все граммемы маски.
+    # Возвращает None, если вариантов нет.
+    def constrain_mask(self, mask):
+        if not mask: return None
+        constrained = self.__constrained
+        if constrained is not None and mask in constrained: return constrained[mask]
+
+        variants = []
+        masks    = []
+        for variant, variant_mask in zip(self.variants, self.masks):
+            if variant_mask & mask == mask:
+                variants.append(variant)
+                masks.append(variant_mask)
+        word = Word.derive(self.text, variants, masks, self.backend) if len(variants) else None
+        self.__remember(mask, word)
+        return word
 
     # Возвращает копию слова с подмножеством вариантов, имеющих указанную нормальную форму.
     # Возвращает None, если вариантов нет.
     def constrain_normal_form(self, normal_form):
+        constrained = self.__constrained
+        if constrained is not None and normal_form in constrained: return constrained[normal_form]
+
         variants = []
-        for variant in self.variants:
+        masks    = []
+        for variant, variant_mask in zip(self.variants, self.masks):
             if variant.normal_form == normal_form:
                 variants.append(variant)
-        if not len(variants): return None
-        return Word(self.text, variants = variants)
+                masks.append(variant_mask)
+        word = Word.derive(self.text, variants, masks, self.backend) if len(variants) else None
+        self.__remember(normal_form, word)
+        return word
+
+    # Ключи - маски (int) для constrain и нормальные формы (str) для constrain_normal_form.
+    def __remember(self, key, word):
+        if self.__constrained is None: self.__constrained = {}
+        if len(self.__constrained) < Word.constrain_cache_size: self.__constrained[key] = word
 
     # Склоняет слово по заданным граммемам
     # По умолчанию фиксирует часть речи (не склоняет "делать" на "делающего", как pymorphy2).
+    # Результат кэшируется по вариантам слова и граммемам и разделяется всеми вызывающими, изменять его нельзя.
     def inflect(self, grammemes):
+        backend = self.backend or Word.default_backend()
+        key     = (tuple(self.variants), frozenset(grammemes), backend)
+        word    = Word.inflect_cache.get(key, False)
+        if word is not False: return word
+        word = self.__inflect(grammemes, backend)
+        Word.inflect_cache.put(key, word)
+        return word
+
+    def __inflect(self, grammemes, backend):
         variants = []
         for variant in self.variants:
-            inflected = variant.inflect(grammemes)
+            inflected = backend.inflect(variant, grammemes)
             if inflected: variants.append(inflected)
         if not len(variants): return None
 
-        own_poss = {g for v in self.variants for g in v.tag.grammemes if g in ABSTRACT_GRAMMEMES[POS]}
-        new_poss = {g for v in variants for g in v.tag.grammemes if g in ABSTRACT_GRAMMEMES[POS]}
-        poss = own_poss & new_poss
-        if not len(poss): return None
-        pos = poss.pop()
-        variants = [v for v in variants if pos in v.tag.grammemes]
-        if not len(variants): return None
+        masks    = [tag_mask(v.tag) for v in variants]
+        own_poss = self.mask
+        new_poss = 0
+        for mask in masks: new_poss |= mask
+        poss = own_poss & new_poss & Word.__pos_mask
+        if not poss: return None
+        pos = poss & -poss
+
+        variants = [v for v, m in zip(variants, masks) if m & pos]
+        text     = variants[0].word
+        return Word(text, variants = [v for v in variants if v.word == text], backend = self.backend)
 
-        text = variants[0].word
-        return Word(text, variants = [v for v in variants if v.word == text])
+    # Создаёт слово из уже отобранных вариантов и их масок, минуя фильтрацию по порогу.
+    @staticmethod
+    def derive(text, variants, masks, backend = None):
+        word            = Word.__new__(Word)
+        word.text       = text
+        word.threshold  = 0
+        word.backend    = backend
+        word.__variants = variants
+        word.__masks    = masks
+        word.__mask     = None
+        word.__constrained = None
+        return word
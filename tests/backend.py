@@ -0,0 +1,118 @@
+import pickle
+from unittest import main, TestCase, skip
+from polymorphy import Seq, Word
+from polymorphy.constants import *
+from polymorphy.patterns import *
+from polymorphy.backend import Backend, Pymorphy2Backend
+
+
+# Анализатор поверх pymorphy2, который считает вызовы.
+class CountingBackend(Backend):
+    __slots__ = ('base', 'parsed', 'batches', 'inflected')
+
+    def __init__(self, base):
+        self.base      = base
+        self.parsed    = []
+        self.batches   = []
+        self.inflected = 0
+
+    def parse(self, text):
+        self.parsed.append(text)
+        return self.base.parse(text)
+
+    def parse_many(self, texts):
+        self.batches.append(sorted(texts))
+        return [self.base.parse(text) for text in texts]
+
+    def inflect(self, variant, grammemes):
+        self.inflected += 1
+        return self.base.inflect(variant, grammemes)
+
+
+# Анализатор, который отдаёт варианты pymorphy2 в обратном порядке.
+class ReversedBackend(Backend):
+    __slots__ = ('base',)
+
+    def __init__(self):
+        self.base = Pymorphy2Backend()
+
+    def parse(self, text):
+        return list(reversed(self.base.parse(text)))
+
+
+class TestBackend(TestCase):
+    def setUp(self):
+        self.default = Word.default_backend()
+        self.backend = CountingBackend(self.default)
+
+    def tearDown(self):
+        Word.set_backend(self.default)
+
+    def test_default(self):
+        backend = Pymorphy2Backend()
+        self.assertEqual(
+            [(v.tag, v.normal_form) for v in backend.parse('стали')],
+            [(v.tag, v.normal_form) for v in Word('стали').variants],
+        )
+        self.assertTrue(backend.word_is_known('стол'))
+        self.assertFalse(CountingBackend(backend).word_is_known('стол'))
+        self.assertTrue('NOUN' in backend.grammemes())
+
+    def test_abstract(self):
+        class Partial(Backend):
+            def inflect(self, variant, grammemes):
+                return None
+        with self.assertRaises(TypeError): Backend()
+        with self.assertRaises(TypeError): Partial()
+
+    def test_seq(self):
+        seq = Seq('зеленый стол', backend = self.backend)
+        self.assertEqual(PatternSeq(ADJF, NOUN).match(seq).seq.text, 'зеленый стол')
+        self.assertEqual(self.backend.parsed, ['зеленый', 'стол'])
+        Seq('зеленый стол').words[0].variants
+        self.assertEqual(self.backend.parsed, ['зеленый', 'стол'])
+
+    def test_cache_key(self):
+        Word('стол').variants
+        Word('стол', backend = self.backend).variants
+        Word('стол', backend = self.backend).variants
+        self.assertEqual(self.backend.parsed, ['стол'])
+
+    def test_parse_many(self):
+        seqs = Seq.batch(['синий стул', 'синий стол', 'стул'], backend = self.backend)
+        self.assertEqual(self.backend.batches, [['синий', 'стол', 'стул']])
+        self.assertEqual(self.backend.parsed, [])
+        self.assertEqual([s.text for s in seqs], ['синий стул', 'синий стол', 'стул'])
+
+    def test_inflect(self):
+        seq = Seq('синий стол', backend = self.backend)
+        self.assertEqual(seq.inflect({'plur'}).text, 'синие столы')
+        self.assertTrue(self.backend.inflected > 0)
+        self.assertTrue(seq.inflect({'plur'})[0].backend is self.backend)
+
+    def test_pickle(self):
+        seq      = Seq('стали стальные', backend = ReversedBackend())
+        seq      = Seq.from_words([seq[0], seq[1].inflect({'sing', 'gent'})])
+        restored = pickle.loads(pickle.dumps(seq))
+        self.assertTrue(type(restored[0].backend) is ReversedBackend)
+        self.assertTrue(restored[0].backend is restored[1].backend)
+        self.assertTrue(restored[0].backend.base is Word.default_backend())
+        for word, copy in zip(seq, restored):
+            self.assertEqual(
+                [(v.word, v.tag, v.normal_form) for v in copy.variants],
+                [(v.word, v.tag, v.normal_form) for v in word.variants],
+            )
+        self.assertNotEqual(
+            [v.tag for v in restored[0].variants],
+            [v.tag for v in Word('стали').variants],
+        )
+        self.assertTrue(pickle.loads(pickle.dumps(Word('стол'))).backend is None)
+
+    def test_global(self):
+        Word.set_backend(self.backend)
+        Word('лампа').variants
+        self.assertEqual(self.backend.parsed, ['лампа'])
+
+
+if __name__ == '__main__':
+    unittest.main()
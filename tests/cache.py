@@ -0,0 +1,50 @@
+from unittest import main, TestCase, skip
+from polymorphy.cache import LRUCache
+
+
+class TestLRUCache(TestCase):
+    def test_get_put(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('b', 0), 0)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_evict(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertTrue('c' in cache)
+
+    def test_resize(self):
+        cache = LRUCache(3)
+        for key in 'abc': cache.put(key, key)
+        cache.resize(1)
+        self.assertEqual(len(cache), 1)
+        self.assertTrue('c' in cache)
+
+    def test_disabled(self):
+        cache = LRUCache(0)
+        cache.put('a', 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_unbounded(self):
+        cache = LRUCache(None)
+        for i in range(100): cache.put(i, i)
+        self.assertEqual(len(cache), 100)
+
+    def test_clear(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.get('a')
+        cache.clear()
+        self.assertEqual(cache.info(), (0, 0, 2, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
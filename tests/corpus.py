@@ -0,0 +1,43 @@
+from unittest import main, TestCase, skip
+from polymorphy.constants import *
+from polymorphy.patterns import *
+from polymorphy.dsl import pattern
+from polymorphy.corpus import match_corpus
+
+
+TEXTS = [
+    'зеленый стол и синий стул',
+    'в углу никого нет',
+    'тихий скрип медной ручки',
+    '',
+    'большая круглая пуговица',
+] * 3
+
+
+class TestMatchCorpus(TestCase):
+    def expected(self, pattern):
+        return [[(m.start, m.end) for m in pattern.finditer(text)] for text in TEXTS]
+
+    def test_single_process(self):
+        p = PatternSeq(PatternRepeat(ADJF), NOUN)
+        self.assertEqual(list(match_corpus(p, TEXTS, workers = 1, chunksize = 4)), self.expected(p))
+
+    def test_pool(self):
+        p = pattern('seq { repeat { ADJF } NOUN }')
+        self.assertEqual(list(match_corpus(p, iter(TEXTS), workers = 2, chunksize = 2)), self.expected(p))
+
+    def test_matches(self):
+        p = pattern('seq { $adj: ADJF $noun: NOUN }')
+        for workers in (1, 2):
+            found = list(match_corpus(p, TEXTS, workers = workers, chunksize = 2, matches = True))
+            self.assertEqual([[(m.start, m.end) for m in ms] for ms in found], self.expected(p))
+            self.assertEqual([m.seq.text for m in found[0]], ['зеленый стол', 'синий стул'])
+            self.assertEqual([g.text for g in found[0][1].groups['noun']], ['стул'])
+
+    def test_pool_empty(self):
+        p = PatternUnit(NOUN)
+        self.assertEqual(list(match_corpus(p, [], workers = 2)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,7 @@
+import builtins
+import os
+import pickle
+import tempfile
 from unittest import main, TestCase, skip
 from lark import Tree
 from lark.lexer import Token
@@ -80,12 +84,35 @@ class TestParser(TestCase):
             ]}
         ]}]})
 
+        tree = simplify_tree(parser.parse('repeat(1: lazy) { NOUN }'))
+        self.assertEqual(tree, {'root': [{'pattern_repeat': [
+            {'r_min': ['1']},
+            {'r_mode': ['lazy']},
+            {'nested_pattern': [
+                {'pattern_unit': ['NOUN']},
+            ]}
+        ]}]})
+
+        tree = simplify_tree(parser.parse('repeat(possessive) { NOUN }'))
+        self.assertEqual(tree, {'root': [{'pattern_repeat': [
+            {'r_mode': ['possessive']},
+            {'nested_pattern': [
+                {'pattern_unit': ['NOUN']},
+            ]}
+        ]}]})
+
     def test_pattern_maybe(self):
         tree = simplify_tree(parser.parse('maybe { NOUN }'))
         self.assertEqual(tree, {'root': [{'pattern_maybe': [{'nested_pattern': [
             {'pattern_unit': ['NOUN']},
         ]}]}]})
 
+        tree = simplify_tree(parser.parse('maybe(lazy) { NOUN }'))
+        self.assertEqual(tree, {'root': [{'pattern_maybe': [
+            {'r_mode': ['lazy']},
+            {'nested_pattern': [{'pattern_unit': ['NOUN']}]},
+        ]}]})
+
     def test_pattern_same(self):
         tree = simplify_tree(parser.parse('same(GNdr CAse) { seq { NOUN ADJF } }'))
         self.assertEqual(tree, {'root': [{'pattern_same': [
@@ -201,10 +228,22 @@ class TestTransformer(TestCase):
         p = pattern('repeat(2:5) { NOUN }')
         self.assertEqual(p.min_repeats, 2)
         self.assertEqual(p.max_repeats, 5)
+        self.assertEqual(p.mode, GREEDY)
+
+        p = pattern('repeat(2:5, lazy) { NOUN }')
+        self.assertEqual((p.min_repeats, p.max_repeats, p.mode), (2, 5, LAZY))
+
+        p = pattern('repeat(possessive) { NOUN }')
+        self.assertEqual((p.min_repeats, p.max_repeats, p.mode), (0, None, POSSESSIVE))
 
     def test_pattern_maybe(self):
         p = pattern('maybe { NOUN }')
         self.assertTrue(isinstance(p, PatternMaybe))
+        self.assertEqual(p.mode, GREEDY)
+
+        p = pattern('maybe(possessive) { NOUN }')
+        self.assertTrue(isinstance(p, PatternMaybe))
+        self.assertEqual(p.mode, POSSESSIVE)
 
     def test_pattern_same(self):
         p = pattern('same(GNdr CAse) { seq { NOUN ADJF } }')
@@ -268,3 +307,60 @@ class TestFragments(TestCase):
         self.assertEqual(p.sub.parts[0].grammeme, NOUN)
         self.assertEqual(p.sub.parts[1].grammeme, ADJF)
 
+
+class TestCache(TestCase):
+    def setUp(self):
+        purge()
+
+    def test_compile(self):
+        p1 = pattern('seq { ADJF NOUN }')
+        p2 = compile_pattern('seq { ADJF NOUN }')
+        self.assertTrue(p1 is p2)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertFalse(build('seq { ADJF NOUN }') is p1)
+        self.assertTrue(compile is builtins.compile)
+
+    def test_purge(self):
+        p1 = pattern('NOUN')
+        purge()
+        self.assertEqual(len(cache), 0)
+        self.assertFalse(pattern('NOUN') is p1)
+
+    def test_dump_load(self):
+        pattern('seq { ADJF NOUN }')
+        pattern('repeat(1:) { @obj } @obj: same(GNdr) { seq { ADJF NOUN } }')
+        with tempfile.TemporaryDirectory() as path:
+            path = os.path.join(path, 'patterns.pickle')
+            dump_cache(path)
+            purge()
+            self.assertEqual(load_cache(path), 2)
+        self.assertEqual(len(cache), 2)
+        p = pattern('repeat(1:) { @obj } @obj: same(GNdr) { seq { ADJF NOUN } }')
+        self.assertEqual(cache.misses, 0)
+        self.assertEqual(p.match('зеленый стол синяя лампа').seq.text, 'зеленый стол синяя лампа')
+
+    def test_load_untrusted(self):
+        with tempfile.TemporaryDirectory() as path:
+            path = os.path.join(path, 'patterns.pickle')
+            for content in ({'NOUN': os.getcwd}, ['NOUN'], {'NOUN': 'NOUN'}, {('NOUN', False): PatternUnit(NOUN)}):
+                with open(path, 'wb') as file: pickle.dump(content, file)
+                with self.assertRaises((pickle.UnpicklingError, ValueError)): load_cache(path)
+            self.assertEqual(len(cache), 0)
+
+
+class TestSource(TestCase):
+    def test_spans(self):
+        text   = 'seq { @obj word("и") @obj } @obj: same(CAse) { seq { maybe { ADJF } NOUN } }'
+        rule   = source(text)
+        p      = rule.pattern
+        self.assertTrue(p is compile_pattern(text))
+        self.assertEqual(rule.snippet(p), 'seq { @obj word("и") @obj }')
+        self.assertEqual(rule.snippet(p.parts[1]), 'word("и")')
+        self.assertEqual(rule.snippet(p.parts[0]), 'same(CAse) { seq { maybe { ADJF } NOUN } }')
+        self.assertEqual(rule.snippet(p.parts[0].sub.parts[0].sub), 'ADJF')
+        self.assertEqual(rule.snippet(p.rest), None)
+
+    def test_repeat(self):
+        source = Source('repeat(1:2) {\n  NOUN\n}', build('repeat(1:2) { NOUN }'))
+        self.assertEqual(source.snippet(source.pattern), 'repeat(1:2) { NOUN }')
+        self.assertEqual(source.span(source.pattern.sub), (16, 20))
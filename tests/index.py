@@ -0,0 +1,69 @@
+import os
+import tempfile
+from collections import namedtuple
+from unittest import main, TestCase, skip
+from polymorphy import Seq
+from polymorphy.constants import *
+from polymorphy.patterns import *
+from polymorphy.prefilter import WORD, LEXEME, GRAMMEME
+from polymorphy.masks import grammemes, tag_mask
+from polymorphy.index import CorpusIndex, Query
+
+
+class TestCorpusIndex(TestCase):
+    def setUp(self):
+        self.index = CorpusIndex([
+            'зеленый стол стоит в углу',
+            'в углу стоит синий стул',
+            'он имел дом в деревне',
+            'стол у окна',
+        ])
+
+    def test_postings(self):
+        self.assertEqual(self.index.sentences((WORD, 'в')), {0: [3], 1: [0], 2: [3]})
+        self.assertEqual(self.index.sentences((LEXEME, 'стол')), {0: [1], 3: [0]})
+        self.assertTrue(2 in self.index.sentences((GRAMMEME, VERB)))
+        self.assertEqual(self.index.sentences((WORD, 'лампа')), {})
+
+    # Граммема, которую добавил тег пользовательского анализатора уже после загрузки таблицы граммем.
+    def test_new_grammeme(self):
+        Tag     = namedtuple('Tag', ['grammemes'])
+        Variant = namedtuple('Variant', ['normal_form', 'tag'])
+        Stub    = namedtuple('Stub', ['text', 'variants', 'masks'])
+        grammemes()
+        tag   = Tag(frozenset([NOUN, 'Xidx']))
+        word  = Stub('икс', [Variant('икс', tag)], [tag_mask(tag)])
+        atoms = CorpusIndex.atoms(word)
+        self.assertTrue((GRAMMEME, 'Xidx') in atoms)
+        self.assertTrue((GRAMMEME, NOUN) in atoms)
+
+    def test_candidates(self):
+        self.assertEqual(self.index.candidates(PatternLexeme('стол')), [0, 3])
+        self.assertEqual(self.index.candidates(PatternSeq(ADJF, PatternLexeme('стол'))), [0])
+        self.assertEqual(self.index.candidates(PatternSeq(PatternLexeme('иметь'), NOUN)), [2])
+        self.assertEqual(self.index.candidates(PatternSeq(ADJF, NOUN)), [0, 1])
+        self.assertEqual(self.index.candidates(PatternUnit(ANY)), [0, 1, 2, 3])
+
+    def test_phrases(self):
+        pattern = PatternSeq(PatternWord('в'), PatternUnit(ANY), PatternLexeme('стоять'))
+        self.assertEqual(Query(pattern).phrases, [[{(WORD, 'в')}, None, {(LEXEME, 'стоять')}]])
+        self.assertEqual(self.index.candidates(pattern), [1])
+        self.assertEqual(self.index.candidates(PatternSeq(PatternWord('в'), PatternWord('углу'))), [0, 1])
+        self.assertEqual(self.index.candidates(PatternSeq(PatternWord('углу'), PatternWord('в'))), [])
+
+    def test_finditer(self):
+        pattern = PatternSeq(PatternWord('в'), PatternNamed('place', NOUN))
+        found   = [(sentence, m.start, m.groups['place'][0].text) for sentence, m in self.index.finditer(pattern)]
+        self.assertEqual(found, [(0, 3, 'углу'), (1, 0, 'углу'), (2, 3, 'деревне')])
+
+    def test_save_load(self):
+        path = os.path.join(tempfile.mkdtemp(), 'index.pickle')
+        self.index.save(path)
+        index = CorpusIndex.load(path)
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.postings, self.index.postings)
+        self.assertEqual(index.candidates(PatternLexeme('окно')), [3])
+
+
+if __name__ == '__main__':
+    unittest.main()
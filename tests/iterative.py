@@ -0,0 +1,114 @@
+from unittest import main, TestCase, skip
+from polymorphy import Seq
+from polymorphy.constants import *
+from polymorphy.patterns import *
+from polymorphy.iterative import iterate
+from polymorphy.profiler import Profile
+
+
+class TestIterative(TestCase):
+    seq = Seq('зеленый стол и синий стул стоят в углу')
+
+    patterns = [
+        PatternUnit(NOUN),
+        PatternSeq(PatternRepeat(ADJF), NOUN),
+        PatternAny(PatternSeq(ADJF, NOUN), NOUN, PatternWord('и')),
+        PatternAll(PatternRepeat(ANY)[1:3], PatternSeq(ADJF, PatternMaybe(NOUN))),
+        PatternSame([GNdr, CAse], PatternSeq(PatternMaybe(ADJF), NOUN)),
+        PatternSeq(PatternNamed('a', PatternSeq(ADJF, NOUN)), PatternRepeat(ANY)[2:4], PatternNamed('a', NOUN)),
+        PatternRepeat(PatternAny(ADJF, NOUN, PatternUnit(ANY)))[2:],
+        PatternSeq(PatternRepeat(PatternAny(ADJF, ANY), mode = LAZY), NOUN),
+        PatternSeq(PatternRepeat(ANY, mode = LAZY)[1:3], PatternMaybe(NOUN, LAZY)),
+        PatternSeq(PatternRepeat(PatternAny(ADJF, NOUN, ANY), mode = POSSESSIVE), PatternMaybe(NOUN, POSSESSIVE)),
+        PatternRepeat(PatternSeq(PatternMaybe(ADJF, POSSESSIVE), NOUN), 1, None, POSSESSIVE),
+    ]
+
+    def assertSameMatches(self, expected, actual):
+        self.assertEqual(
+            [(m.start, m.end, {k: [s.text for s in v] for k, v in m.groups.items()}) for m in expected],
+            [(m.start, m.end, {k: [s.text for s in v] for k, v in m.groups.items()}) for m in actual],
+        )
+
+    def test_order(self):
+        for pattern in self.patterns:
+            self.assertSameMatches(list(pattern.match_gen(self.seq)), list(iterate(pattern, self.seq)))
+
+    def test_budget(self):
+        for packrat in (False, True):
+            for pattern in self.patterns:
+                expected = MatchContext.create(packrat, steps = 10 ** 6)
+                actual   = MatchContext.create(packrat, steps = 10 ** 6)
+                self.assertSameMatches(list(pattern.match_ctx(self.seq, 0, expected)), list(iterate(pattern, self.seq, actual)))
+                self.assertEqual(actual.budget.count, expected.budget.count)
+
+    def test_packrat(self):
+        for pattern in self.patterns:
+            expected = MatchContext.create(packrat = True)
+            actual   = MatchContext.create(packrat = True)
+            self.assertSameMatches(list(pattern.match_ctx(self.seq, 0, expected)), list(iterate(pattern, self.seq, actual)))
+
+    def test_profile(self):
+        for packrat in (False, True):
+            for pattern in self.patterns:
+                expected = Profile(trace = True)
+                actual   = Profile(trace = True)
+                self.assertSameMatches(
+                    list(pattern.match_ctx(self.seq, 0, MatchContext.create(packrat, steps = 10 ** 6, profile = expected))),
+                    list(iterate(pattern, self.seq, MatchContext.create(packrat, steps = 10 ** 6, profile = actual))),
+                )
+                self.assertEqual(
+                    {k: (s.calls, s.matches, s.backtracks, s.failures) for k, s in actual.stats.items()},
+                    {k: (s.calls, s.matches, s.backtracks, s.failures) for k, s in expected.stats.items()},
+                )
+                self.assertEqual(
+                    [(e.event, e.lvl, e.pattern, e.offset, e.length) for e in actual.events],
+                    [(e.event, e.lvl, e.pattern, e.offset, e.length) for e in expected.events],
+                )
+                for stats in actual.stats.values(): self.assertTrue(0 <= stats.own <= stats.time + 1e-3)
+
+    def test_deep(self):
+        seq     = Seq(' '.join(['стол'] * 2000))
+        pattern = PatternSeq(PatternRepeat(ANY), PatternWord('конец'))
+        self.assertEqual(pattern.match(seq), None)
+        self.assertEqual(pattern.match(seq, packrat = True), None)
+        self.assertEqual(pattern.match(seq, profile = Profile()), None)
+        pattern = PatternRepeat(PatternSeq(NOUN, PatternMaybe(ADJF)))[1:]
+        self.assertEqual(pattern.match(seq).end, 2000)
+        self.assertEqual(pattern.match(seq, packrat = True, profile = Profile()).end, 2000)
+        self.assertEqual(len(pattern.findall(seq)), 1)
+
+    def test_threshold(self):
+        seq     = Seq(' '.join(['стол'] * 200))
+        pattern = PatternRepeat(NOUN)
+        limit   = PatternAbstract.iterative_from
+        try:
+            for value in (None, 0, 128):
+                PatternAbstract.iterative_from = value
+                self.assertEqual(pattern.match(seq).end, 200)
+                with self.assertRaises(MatchLimitExceeded):
+                    pattern.match(seq, steps = 50)
+        finally:
+            PatternAbstract.iterative_from = limit
+
+    def test_custom(self):
+        class PatternTwice(PatternAbstract):
+            __slots__ = ('sub', 'min', 'max')
+
+            def __init__(self, sub):
+                self.sub = sub
+                self.min = sub.min * 2
+                self.max = None if sub.max is None else sub.max * 2
+
+            def match_gen(self, seq, lvl = 0, ctx = None):
+                for first in self.sub.match_ctx(seq, lvl + 1, ctx):
+                    for second in self.sub.match_ctx(seq[first.end - first.start:], lvl + 1, ctx):
+                        yield first + second
+
+        pattern = PatternSeq(ADJF, PatternTwice(PatternUnit(NOUN)))
+        seq     = Seq('зеленый стол стул')
+        self.assertSameMatches(list(pattern.match_gen(seq)), list(iterate(pattern, seq)))
+        self.assertEqual(len(list(iterate(pattern, seq))), 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+from unittest import main, TestCase, skip
+from polymorphy import Word
+from polymorphy.constants import *
+from polymorphy.masks import grammemes, grammeme_mask, tag_mask, mask_grammemes
+
+
+class TestMasks(TestCase):
+    def test_order(self):
+        order = grammemes()
+        self.assertEqual(order[:3], ABSTRACT_GRAMMEMES[POS][:3])
+        self.assertTrue('Name' in order)
+        self.assertEqual(len(order), len(set(order)))
+
+    def test_grammeme_mask(self):
+        self.assertEqual(grammeme_mask(NOUN), 1)
+        self.assertEqual(grammeme_mask(NOUN, ADJF), 3)
+        self.assertEqual(grammeme_mask('unknown'), 0)
+        self.assertEqual(grammeme_mask(), 0)
+
+    def test_mask_grammemes(self):
+        self.assertEqual(mask_grammemes(grammeme_mask(ADJF, NOUN)), [NOUN, ADJF])
+        self.assertEqual(mask_grammemes(0), [])
+
+    def test_tag_mask(self):
+        for variant in Word('стали').variants:
+            mask = tag_mask(variant.tag)
+            for grammeme in grammemes():
+                self.assertEqual(bool(mask & grammeme_mask(grammeme)), grammeme in variant.tag.grammemes)
+
+
+if __name__ == '__main__':
+    unittest.main()
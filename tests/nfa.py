@@ -0,0 +1,98 @@
+from unittest import main, TestCase, skip
+from polymorphy import Seq
+from polymorphy.constants import *
+from polymorphy.patterns import *
+from polymorphy.nfa import compile_automaton, Automaton
+
+
+def describe(match):
+    if match is None: return None
+    return (
+        match.start,
+        match.end,
+        [(w.text, w.variants) for w in match.seq],
+        {n: [s.text for s in g] for n, g in match.groups.items()},
+    )
+
+
+class TestAutomaton(TestCase):
+    def assertSame(self, pattern, text):
+        automaton = compile_automaton(pattern)
+        self.assertTrue(isinstance(automaton, Automaton))
+        seq = Seq(text)
+        self.assertEqual(describe(automaton.match(seq)), describe(pattern.match(seq)))
+        self.assertEqual([describe(m) for m in automaton.finditer(seq)], [describe(m) for m in pattern.finditer(seq)])
+
+    def test_units(self):
+        self.assertSame(PatternUnit(INFN), 'бежать одеяло наверное')
+        self.assertSame(PatternUnit(NOUN), 'бежать одеяло наверное')
+        self.assertSame(PatternWord('столы'), 'столы большие')
+        self.assertSame(PatternLexeme('стол'), 'столы большие')
+        self.assertSame(PatternAll(ADJF, accs), 'ведущий')
+
+    def test_any(self):
+        self.assertSame(PatternAny(ADJF, accs), 'ведущий')
+        self.assertSame(PatternSeq(ADJF, PatternAny(NOUN, INFN)), 'зеленый делать стол')
+
+    def test_repeat(self):
+        text = 'большая круглая перламутровая пуговица'
+        self.assertSame(PatternRepeat(ADJF), text)
+        self.assertSame(PatternRepeat(ADJF)[:2], text)
+        self.assertSame(PatternRepeat(ADJF)[2:], text)
+        self.assertSame(PatternRepeat(INFN)[1:], text)
+        self.assertSame(PatternMaybe(ADJF), text)
+        self.assertSame(PatternRepeat(PatternMaybe(ADJF), 2, 2), text)
+        self.assertSame(PatternRepeat(PatternAny(nomn, accs)), 'большой стол')
+
+    def test_lazy(self):
+        text = 'большая круглая перламутровая пуговица'
+        self.assertSame(PatternRepeat(ADJF, mode = LAZY), text)
+        self.assertSame(PatternSeq(PatternRepeat(ADJF, mode = LAZY), ADJF), text)
+        self.assertSame(PatternSeq(PatternRepeat(ADJF, mode = LAZY)[1:3], NOUN), text)
+        self.assertSame(PatternSeq(PatternMaybe(ADJF, LAZY), ADJF), text)
+        self.assertSame(PatternSeq(PatternRepeat(PatternAny(ADJF, ANY), mode = LAZY), NOUN), text)
+
+    def test_same(self):
+        self.assertSame(PatternSame([CAse], PatternSeq(ADJF, NOUN)), 'зеленый стол в углу')
+        self.assertSame(PatternSame([GNdr], PatternSeq(ADJF, NOUN)), 'зеленая стол')
+        self.assertSame(PatternSame([GNdr], PatternRepeat(ANY)), 'большая зеленая деревянное круглая')
+        self.assertSame(PatternSame([CAse, GNdr], PatternRepeat(ADJF)), 'зеленый большой пуговица')
+
+    def test_named(self):
+        pattern = PatternSeq(
+            PatternNamed('act', PatternSame([GNdr, nomn], PatternSeq(PatternRepeat(ADJF), NOUN))),
+            PatternRepeat(PatternNamed('obj',
+                PatternSame([GNdr, gent], PatternSeq(PatternRepeat(ADJF), NOUN))
+            )),
+        )
+        self.assertSame(pattern, 'тихий скрип гладкой медной ручки входной двери')
+        self.assertSame(PatternNamed('a', PatternNamed('b', NOUN)), 'стол')
+
+    def test_fallback(self):
+        pattern = PatternAll(PatternRepeat(ADJF), ADJF)
+        self.assertTrue(compile_automaton(pattern) is pattern)
+        pattern = PatternSeq(PatternRepeat(ADJF, mode = POSSESSIVE), NOUN)
+        self.assertTrue(compile_automaton(pattern) is pattern)
+
+    def test_ambiguous(self):
+        pattern = PatternSeq(PatternRepeat(PatternAny(ANY, ADJF, NOUN)), PatternWord('конец'))
+        seq     = Seq(' '.join(['зеленый'] * 200))
+        self.assertEqual(compile_automaton(pattern).match(seq), None)
+        self.assertEqual(compile_automaton(pattern).match(seq + 'конец').end, 201)
+
+    def test_nullable_repeat(self):
+        pattern = PatternSeq(PatternRepeat(PatternMaybe(ADJF)), NOUN)
+        self.assertEqual(compile_automaton(pattern).match('большой зеленый стол').seq.text, 'большой зеленый стол')
+
+
+    def test_steps(self):
+        automaton = compile_automaton(PatternSeq(PatternRepeat(PatternAny(ANY, ADJF, NOUN)), PatternWord('конец')))
+        seq       = Seq(' '.join(['зеленый'] * 200))
+        with self.assertRaises(MatchLimitExceeded) as raised:
+            automaton.match(seq, steps = 100)
+        self.assertTrue(raised.exception.pattern is automaton.pattern)
+        self.assertEqual(automaton.match(seq, steps = 100000), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import pickle
+from unittest import main, TestCase, skip
+from polymorphy import Seq
+from polymorphy import dsl
+from polymorphy.constants import *
+from polymorphy.patterns import *
+from polymorphy.optimize import *
+
+
+class TestOptimize(TestCase):
+    def test_flatten(self):
+        p = optimize(PatternSeq(ADJF, PatternSeq(ADJF, PatternSeq(NOUN))))
+        self.assertTrue(isinstance(p, PatternSeq))
+        self.assertEqual([part.grammeme for part in p.parts], [ADJF, ADJF, NOUN])
+
+        p = optimize(PatternAny(NOUN, PatternAny(ADJF, VERB)))
+        self.assertEqual([a.grammeme for a in p.patterns], [NOUN, ADJF, VERB])
+
+    def test_single(self):
+        p = optimize(PatternSeq(PatternAny(PatternRepeat(NOUN, 1, 1))))
+        self.assertTrue(isinstance(p, PatternUnit))
+        self.assertEqual(p.grammeme, NOUN)
+
+    def test_dedupe(self):
+        p = optimize(PatternAny(PatternSeq(ADJF, NOUN), PatternWord('и'), PatternSeq(ADJF, NOUN)))
+        self.assertEqual(len(p.patterns), 2)
+        self.assertTrue(isinstance(p.patterns[1], PatternWord))
+
+    def test_predicates(self):
+        p = optimize(PatternAll(NOUN, PatternWord('стали'), PatternAll(gent, ANY), PatternLexeme('сталь')))
+        self.assertTrue(isinstance(p, PatternAll))
+        self.assertEqual([type(q) for q in p.patterns], [PatternWord, PatternLexeme, PatternUnits])
+        self.assertEqual(p.patterns[2].grammemes, [NOUN, gent])
+        self.assertEqual(p.match('стали').seq, PatternAll(NOUN, gent).match('стали').seq)
+        self.assertEqual(p.match('стол'), None)
+
+    def test_predicates_order(self):
+        seq = PatternSeq(ADJF, NOUN)
+        p   = optimize(PatternAll(nomn, seq, NOUN, PatternWord('стол')))
+        self.assertEqual([type(q) for q in p.patterns], [PatternUnit, PatternSeq, PatternWord, PatternUnit])
+
+    def test_units(self):
+        p = PatternUnits(NOUN, gent)
+        self.assertEqual(p.match('стали').seq, PatternAll(NOUN, gent).match('стали').seq)
+        self.assertEqual(p.match('стол'), None)
+        self.assertEqual(PatternUnits(NOUN, 'unknown').match('стол'), None)
+        self.assertEqual(pickle.loads(pickle.dumps(p)).grammemes, [NOUN, gent])
+
+    def test_repeat(self):
+        p = optimize(PatternRepeat(PatternMaybe(NOUN)))
+        self.assertEqual((type(p), p.min_repeats, p.max_repeats), (PatternRepeat, 0, None))
+        self.assertEqual(p.match('стол стул бежать').seq.text, 'стол стул')
+
+        p = optimize(PatternRepeat(PatternRepeat(NOUN), 1, None))
+        self.assertEqual((p.sub.grammeme, p.min_repeats, p.max_repeats), (NOUN, 0, None))
+
+        p = optimize(PatternMaybe(PatternRepeat(NOUN, 1, None)))
+        self.assertEqual((type(p), p.sub.grammeme, p.min_repeats), (PatternRepeat, NOUN, 0))
+
+        p = optimize(PatternRepeat(PatternRepeat(NOUN, 1, None), 2, None))
+        self.assertEqual((p.min_repeats, p.sub.min_repeats), (2, 1))
+
+        p = optimize(PatternMaybe(PatternMaybe(NOUN)))
+        self.assertEqual((type(p), p.sub.grammeme), (PatternMaybe, NOUN))
+
+        p = optimize(PatternRepeat(PatternRepeat(NOUN, 1, 3), 0, 2))
+        self.assertEqual((p.min_repeats, p.max_repeats, p.sub.max_repeats), (0, 2, 3))
+
+    def test_repeat_modes(self):
+        p = optimize(PatternRepeat(PatternMaybe(NOUN, LAZY), mode = LAZY))
+        self.assertEqual((type(p), p.sub.grammeme, p.min_repeats, p.mode), (PatternRepeat, NOUN, 0, LAZY))
+
+        p = optimize(PatternMaybe(PatternMaybe(NOUN, POSSESSIVE), POSSESSIVE))
+        self.assertEqual((type(p), p.sub.grammeme, p.mode), (PatternMaybe, NOUN, POSSESSIVE))
+
+        p = optimize(PatternRepeat(PatternMaybe(NOUN, POSSESSIVE)))
+        self.assertEqual((type(p.sub), p.mode, p.sub.mode), (PatternMaybe, GREEDY, POSSESSIVE))
+
+        p = optimize(PatternMaybe(PatternRepeat(NOUN, 1, None, LAZY)))
+        self.assertEqual((type(p), p.mode, p.sub.mode), (PatternMaybe, GREEDY, LAZY))
+
+        p = optimize(PatternRepeat(PatternAny(NOUN, ADJF), 1, 1, POSSESSIVE))
+        self.assertEqual((type(p), p.mode), (PatternRepeat, POSSESSIVE))
+        self.assertEqual(optimize(PatternRepeat(NOUN, 1, 1, LAZY)).grammeme, NOUN)
+
+    def test_unchanged(self):
+        p = PatternSeq(PatternNamed('a', PatternSeq(ADJF, NOUN)), PatternSame([CAse], PatternRepeat(ADJF)))
+        o = optimize(p)
+        self.assertFalse(o is p)
+        self.assertEqual(pickle.dumps(o), pickle.dumps(p))
+
+    def test_same_results(self):
+        seq = Seq('тихий скрип гладкой медной ручки входной двери и зеленый стол')
+        for p in [
+            PatternSeq(PatternRepeat(PatternAny(ADJF, PatternAny(ADJF, NOUN))), PatternAll(NOUN, PatternAll(gent, ANY))),
+            PatternSame([CAse], PatternSeq(PatternRepeat(PatternRepeat(ADJF, 1, None)), PatternSeq(NOUN))),
+            PatternSeq(PatternNamed('a', PatternAll(ADJF, femn)), PatternMaybe(PatternMaybe(NOUN))),
+        ]:
+            self.assertEqual(
+                [(m.start, m.end, m.seq, m.groups) for m in optimize(p).finditer(seq)],
+                [(m.start, m.end, m.seq, m.groups) for m in p.finditer(seq)],
+            )
+
+    def test_dsl(self):
+        dsl.purge()
+        text = 'seq { seq { ADJF all { NOUN gent } } }'
+        p    = dsl.pattern(text, optimize = True)
+        self.assertTrue(dsl.pattern(text, optimize = True) is p)
+        self.assertEqual(len(p.parts), 2)
+        self.assertTrue(isinstance(p.parts[1], PatternUnits))
+        self.assertTrue(isinstance(dsl.pattern(text), PatternSeq))
+        self.assertEqual(len(dsl.pattern(text).parts), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
+import pickle
 from unittest import main, TestCase, skip
 from polymorphy import Seq
 from polymorphy.constants import *
 from polymorphy.patterns import *
+from polymorphy.iterative import iterate
 
 
 class TestMatch(TestCase):
@@ -25,6 +27,36 @@ class TestMatch(TestCase):
         self.assertEqual(m3.seq, m1.seq + m2.seq)
         self.assertEqual(m3.groups, Match.merge_groups(m1.groups, m2.groups))
 
+    def test_offsets(self):
+        m1 = Match(Seq('бежать'), start = 2)
+        m2 = Match(Seq('одеяло наверное'))
+        m3 = m1 + m2
+        self.assertEqual((m1.start, m1.end), (2, 3))
+        self.assertEqual((m3.start, m3.end), (2, 5))
+
+    def test_add_lazy(self):
+        m1 = Match(Seq('тихий'), {'foo': [Seq('тихий')]})
+        m2 = Match(Seq('скрип медной'))
+        m3 = Match(Seq('ручки'), {'foo': [Seq('ручки')]})
+        m4 = m1 + (m2 + m3)
+        self.assertEqual((m4.start, m4.end), (0, 4))
+        self.assertEqual(m4.seq.text, 'тихий скрип медной ручки')
+        self.assertEqual([s.text for s in m4.groups['foo']], ['тихий', 'ручки'])
+        self.assertEqual(m2.seq.text, 'скрип медной')
+
+    def test_add_deep(self):
+        match = Match(Seq())
+        for word in Seq('раз два три ' * 2000): match = match + Match(Seq.from_words([word]))
+        self.assertEqual(match.end, 6000)
+        self.assertEqual(len(match.seq), 6000)
+
+    def test_shift(self):
+        m1 = Match(Seq('бежать')) + Match(Seq('одеяло'))
+        m2 = m1.shift(3)
+        self.assertEqual((m2.start, m2.end), (3, 5))
+        self.assertEqual((m1.start, m1.end), (0, 2))
+        self.assertEqual(m2.seq.text, 'бежать одеяло')
+
     def test_repr(self):
         m = Match(Seq('бежать'), {'foo': [Seq('а'), Seq('и')], 'bar': [Seq('в')]})
         self.assertEqual(m.__repr__(), 'Match(бежать×2 / 3g)')
@@ -165,6 +197,63 @@ class TestPatternRepeat(TestCase):
         matches = list(pattern.match_gen(seq))
         self.assertEqual(matches, [])
 
+    def test_match_lazy(self):
+        seq     = Seq('большая круглая перламутровая пуговица')
+        pattern = PatternRepeat(ADJF, mode = LAZY)
+        matches = list(pattern.match_gen(seq))
+        texts   = [match.seq.text for match in matches]
+        self.assertEqual(texts, [
+            '',
+            'большая',
+            'большая круглая',
+            'большая круглая перламутровая',
+        ])
+
+        pattern = PatternRepeat(ADJF, mode = LAZY)[2:]
+        self.assertEqual(pattern.mode, LAZY)
+        texts   = [match.seq.text for match in pattern.match_gen(seq)]
+        self.assertEqual(texts, [
+            'большая круглая',
+            'большая круглая перламутровая',
+        ])
+
+    def test_match_possessive(self):
+        seq     = Seq('большая круглая перламутровая пуговица')
+        pattern = PatternRepeat(ADJF, mode = POSSESSIVE)
+        texts   = [match.seq.text for match in pattern.match_gen(seq)]
+        self.assertEqual(texts, ['большая круглая перламутровая'])
+
+        pattern = PatternRepeat(INFN, mode = POSSESSIVE)
+        texts   = [match.seq.text for match in pattern.match_gen(seq)]
+        self.assertEqual(texts, [''])
+
+    def test_possessive_backtracking(self):
+        seq = Seq('большая круглая перламутровая пуговица')
+        self.assertEqual(PatternSeq(PatternRepeat(ADJF), ADJF).match(seq).seq.text, 'большая круглая перламутровая')
+        self.assertEqual(PatternSeq(PatternRepeat(ADJF, mode = POSSESSIVE), ADJF).match(seq), None)
+        self.assertEqual(PatternSeq(PatternRepeat(ADJF, mode = LAZY), NOUN).match(seq).seq.text, seq.text)
+        self.assertEqual(PatternSeq(PatternRepeat(ADJF, mode = LAZY), ADJF).match(seq).seq.text, 'большая')
+
+    def test_lengths_from_offsets(self):
+        materialize = Match._Match__materialize
+        count       = []
+        def counting(match):
+            count.append(match)
+            materialize(match)
+        pattern = PatternSeq(PatternRepeat(PatternSeq(ADJF, NOUN)), VERB)
+        seq     = Seq('зеленый стол синяя лампа стоит')
+        Match._Match__materialize = counting
+        try:
+            self.assertEqual([(m.start, m.end) for m in pattern.match_gen(seq)], [(0, 5)])
+            self.assertEqual([(m.start, m.end) for m in iterate(pattern, seq)], [(0, 5)])
+        finally:
+            Match._Match__materialize = materialize
+        self.assertEqual(count, [])
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            PatternRepeat(ADJF, mode = 'eager')
+
 
 class TestPatternMaybe(TestCase):
     def test_match(self):
@@ -176,6 +265,12 @@ class TestPatternMaybe(TestCase):
         self.assertEqual(pattern.max_repeats, 1)
         self.assertEqual(texts, ['большая', ''])
 
+    def test_modes(self):
+        seq = Seq('большая круглая перламутровая пуговица')
+        self.assertEqual([m.seq.text for m in PatternMaybe(ADJF, LAZY).match_gen(seq)], ['', 'большая'])
+        self.assertEqual([m.seq.text for m in PatternMaybe(ADJF, POSSESSIVE).match_gen(seq)], ['большая'])
+        self.assertEqual([m.seq.text for m in PatternMaybe(NOUN, POSSESSIVE).match_gen(seq)], [''])
+
 
 class TestPatternSeq(TestCase):
     def test_match(self):
@@ -352,5 +447,145 @@ class TestNamed(TestCase):
         ])
 
 
+class TestSearch(TestCase):
+    def test_search(self):
+        pattern = PatternSeq(ADJF, NOUN)
+        match   = pattern.search('в углу стоит зеленый стол')
+        self.assertEqual(match.seq.text, 'зеленый стол')
+        self.assertEqual((match.start, match.end), (3, 5))
+
+    def test_search_mismatch(self):
+        pattern = PatternSeq(ADJF, NOUN)
+        self.assertEqual(pattern.search('в углу стоит'), None)
+
+    def test_finditer(self):
+        pattern = PatternSeq(ADJF, NOUN)
+        seq     = Seq('зеленый стол и синий стул у стены')
+        spans   = [(m.start, m.end, m.seq.text) for m in pattern.finditer(seq)]
+        self.assertEqual(spans, [(0, 2, 'зеленый стол'), (3, 5, 'синий стул')])
+
+    def test_finditer_overlap(self):
+        pattern = PatternRepeat(ADJF)[2:]
+        seq     = Seq('большая круглая перламутровая пуговица')
+        spans   = [(m.start, m.end) for m in pattern.finditer(seq)]
+        self.assertEqual(spans, [(0, 3)])
+
+    def test_finditer_empty(self):
+        pattern = PatternMaybe(NOUN)
+        seq     = Seq('зеленый стол')
+        spans   = [(m.start, m.end) for m in pattern.finditer(seq)]
+        self.assertEqual(spans, [(0, 0), (1, 2), (2, 2)])
+
+    def test_findall_groups(self):
+        pattern = PatternNamed('obj', PatternSeq(ADJF, NOUN))
+        matches = pattern.findall('зеленый стол и синий стул')
+        self.assertEqual([m.groups['obj'][0].text for m in matches], ['зеленый стол', 'синий стул'])
+
+
+class TestPackrat(TestCase):
+    def test_same_results(self):
+        pattern = PatternSeq(
+            PatternRepeat(PatternAny(ADJF, PatternNamed('any', PatternUnit(ANY))))[:3],
+            PatternNamed('obj', PatternAll(NOUN, PatternUnit(ANY))),
+        )
+        seq = Seq('тихий скрип медной ручки входной двери')
+        plain   = pattern.match(seq)
+        packrat = pattern.match(seq, packrat = True)
+        self.assertEqual(packrat.seq.text, 'тихий скрип медной ручки')
+        self.assertEqual(packrat.seq, plain.seq)
+        self.assertEqual(packrat.groups, plain.groups)
+        self.assertEqual(
+            [(m.start, m.end) for m in pattern.finditer(seq, packrat = True)],
+            [(m.start, m.end) for m in pattern.finditer(seq)],
+        )
+
+    def test_exponential(self):
+        pattern = PatternSeq(PatternRepeat(PatternAny(ADJF, PatternUnit(ANY))), PatternWord('конец'))
+        seq     = Seq(' '.join(['зеленый'] * 30))
+        self.assertEqual(pattern.match(seq, packrat = True), None)
+        self.assertFalse(pattern.test(seq, packrat = True))
+        self.assertEqual(pattern.search(seq, packrat = True), None)
+        match = pattern.match(Seq(seq.text + ' конец'), packrat = True)
+        self.assertEqual((match.start, match.end), (0, 31))
+
+    def test_long_input(self):
+        pattern = PatternSeq(PatternRepeat(PatternAny(ADJF, PatternUnit(ANY))), PatternWord('конец'))
+        seq     = Seq(' '.join(['зеленый'] * 1000))
+        self.assertEqual(pattern.match(seq, packrat = True), None)
+        match = pattern.match(Seq(seq.text + ' конец'), packrat = True)
+        self.assertEqual((match.start, match.end), (0, 1001))
+
+    def test_nullable_repeat(self):
+        pattern = PatternRepeat(PatternMaybe(NOUN))
+        match   = pattern.match('стол стул', packrat = True)
+        self.assertEqual((match.start, match.end), (0, 2))
+
+
+class TestLimits(TestCase):
+    def setUp(self):
+        self.any     = PatternAny(ADJF, PatternUnit(ANY))
+        self.pattern = PatternSeq(PatternRepeat(self.any), PatternWord('конец'))
+        self.seq     = Seq(' '.join(['зеленый'] * 30))
+
+    def test_steps(self):
+        with self.assertRaises(MatchLimitExceeded) as raised:
+            self.pattern.match(self.seq, steps = 1000)
+        self.assertEqual(raised.exception.steps, 1001)
+        self.assertTrue(isinstance(raised.exception.pattern, PatternAbstract))
+
+    def test_timeout(self):
+        with self.assertRaises(MatchLimitExceeded):
+            self.pattern.test(self.seq, timeout = 0.01)
+
+    def test_search(self):
+        with self.assertRaises(MatchLimitExceeded):
+            self.pattern.search(self.seq, steps = 1000)
+        with self.assertRaises(MatchLimitExceeded):
+            self.pattern.findall(self.seq, timeout = 0.01)
+
+    def test_within_budget(self):
+        pattern = PatternSeq(ADJF, NOUN)
+        self.assertEqual(pattern.match('зеленый стол', steps = 10).seq.text, 'зеленый стол')
+        self.assertEqual(len(pattern.findall('зеленый стол и синий стул', steps = 100, timeout = 10)), 2)
+
+    def test_packrat(self):
+        self.assertEqual(self.pattern.match(self.seq, packrat = True, steps = 100000), None)
+
+
+class TestPickle(TestCase):
+    def test_patterns(self):
+        obj     = PatternSame([GNdr, gent], PatternSeq(PatternRepeat(ADJF), NOUN))
+        pattern = PatternSeq(
+            PatternNamed('act', PatternSame([GNdr, nomn], PatternSeq(PatternRepeat(ADJF), NOUN))),
+            PatternRepeat(PatternNamed('obj', obj))[1:3],
+            PatternMaybe(PatternAny(PatternWord('и'), PatternLexeme('или'))),
+            PatternAll(ADJF, accs),
+        )
+        restored = pickle.loads(pickle.dumps(pattern))
+        self.assertEqual(restored.parts[0].sub.grms, pattern.parts[0].sub.grms)
+        self.assertEqual(restored.parts[1].min_repeats, 1)
+        self.assertEqual(restored.parts[1].max_repeats, 3)
+        self.assertEqual(pickle.loads(pickle.dumps(PatternRepeat(ADJF, mode = LAZY))).mode, LAZY)
+        self.assertEqual(pickle.loads(pickle.dumps(PatternMaybe(ADJF, POSSESSIVE))).mode, POSSESSIVE)
+        seq = Seq('тихий скрип медной ручки входной двери и зеленый')
+        self.assertEqual(
+            [m.seq.text for m in restored.match_gen(seq)],
+            [m.seq.text for m in pattern.match_gen(seq)],
+        )
+
+    def test_seq_size(self):
+        short = len(pickle.dumps(PatternSeq(*[NOUN] * 10)))
+        long  = len(pickle.dumps(PatternSeq(*[NOUN] * 100)))
+        self.assertTrue(long < short * 10)
+
+    def test_match(self):
+        pattern = PatternSeq(ADJF, PatternNamed('obj', NOUN))
+        match   = pattern.search('в углу стоит зеленый стол')
+        copy    = pickle.loads(pickle.dumps(match))
+        self.assertEqual((copy.start, copy.end), (3, 5))
+        self.assertEqual(copy.seq, match.seq)
+        self.assertEqual(copy.groups['obj'][0].text, 'стол')
+
+
 if __name__ == '__main__':
     unittest.main()
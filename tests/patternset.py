@@ -0,0 +1,57 @@
+from unittest import main, TestCase, skip
+from polymorphy import Seq
+from polymorphy.constants import *
+from polymorphy.patterns import *
+from polymorphy.patternset import PatternSet
+
+
+class TestPatternSet(TestCase):
+    def setUp(self):
+        self.patterns = {
+            'adj_noun': PatternSeq(ADJF, NOUN),
+            'in_noun':  PatternSeq(PatternWord('в'), NOUN),
+            'table':    PatternSeq(ADJF, PatternLexeme('стол')),
+            'verb':     PatternRepeat(VERB)[1:],
+        }
+        self.set = PatternSet(self.patterns)
+
+    def test_finditer(self):
+        seq = Seq('зеленый стол стоит в углу')
+        self.assertEqual([(name, m.start, m.end) for name, m in self.set.finditer(seq)], [
+            ('adj_noun', 0, 2),
+            ('table', 0, 2),
+            ('verb', 2, 3),
+            ('in_noun', 3, 5),
+        ])
+
+    def test_same_as_patterns(self):
+        seq = Seq('тихий скрип медной ручки в зеленом углу и синий стол')
+        for name, pattern in self.patterns.items():
+            expected = [(m.start, m.end, m.seq.text) for m in pattern.finditer(seq)]
+            found    = [(m.start, m.end, m.seq.text) for n, m in self.set.finditer(seq) if n == name]
+            self.assertEqual(found, expected)
+
+    def test_test(self):
+        self.assertEqual(self.set.test('синий стул'), {'adj_noun'})
+        self.assertEqual(self.set.test('и'), set())
+
+    def test_intern(self):
+        patterns = PatternSet([
+            ('a', PatternSeq(ADJF, PatternNamed('obj', NOUN), PatternWord('и'))),
+            ('b', PatternSeq(VERB, PatternNamed('obj', NOUN), PatternWord('и'))),
+        ])
+        a = patterns.patterns['a']
+        b = patterns.patterns['b']
+        self.assertTrue(a.parts[1] is b.parts[1])
+        self.assertTrue(a.rest is b.rest)
+        self.assertTrue(patterns.intern(PatternNamed('obj', NOUN)) is a.parts[1])
+
+    def test_dsl(self):
+        patterns = PatternSet([('pair', 'seq { ADJF NOUN }')])
+        self.assertEqual([name for name, _ in patterns.finditer('зеленый стол')], ['pair'])
+        self.assertTrue('pair' in patterns)
+        with self.assertRaises(ValueError): patterns.add('pair', PatternSeq(NOUN))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+from unittest import main, TestCase, skip
+from polymorphy import Seq
+from polymorphy.constants import *
+from polymorphy.patterns import *
+from polymorphy.prefilter import Prefilter, WORD, LEXEME, first, required, nullable
+
+
+class TestAnalysis(TestCase):
+    def test_required(self):
+        pattern = PatternSeq(ADJF, PatternWord('и'), PatternLexeme('стол'))
+        self.assertEqual(required(pattern), [{(WORD, 'и')}, {(LEXEME, 'стол')}])
+        self.assertEqual(required(PatternSeq(ADJF, NOUN)), [])
+
+    def test_required_any(self):
+        pattern = PatternAny(PatternWord('и'), PatternSeq(PatternWord('или'), PatternLexeme('стол')))
+        self.assertEqual(required(pattern), [{(WORD, 'и'), (WORD, 'или')}, {(WORD, 'и'), (LEXEME, 'стол')}])
+        self.assertEqual(required(PatternAny(PatternWord('и'), NOUN)), [])
+
+    def test_required_repeat(self):
+        self.assertEqual(required(PatternRepeat(PatternWord('и'))), [])
+        self.assertEqual(required(PatternRepeat(PatternWord('и'))[1:]), [{(WORD, 'и')}])
+        self.assertEqual(required(PatternNamed('x', PatternSame([CAse], PatternLexeme('стол')))), [{(LEXEME, 'стол')}])
+
+    def test_first(self):
+        self.assertEqual(first(PatternSeq(PatternWord('в'), PatternLexeme('стол'))), {(WORD, 'в')})
+        self.assertEqual(first(PatternSeq(PatternMaybe(PatternWord('в')), PatternLexeme('стол'))), {(WORD, 'в'), (LEXEME, 'стол')})
+        self.assertEqual(first(PatternSeq(ADJF, PatternLexeme('стол'))), None)
+        self.assertEqual(first(PatternAll(NOUN, PatternLexeme('стол'))), {(LEXEME, 'стол')})
+
+    def test_nullable(self):
+        self.assertTrue(nullable(PatternMaybe(NOUN)))
+        self.assertTrue(nullable(PatternSeq(PatternRepeat(NOUN), PatternMaybe(ADJF))))
+        self.assertFalse(nullable(PatternSeq(PatternRepeat(NOUN), ADJF)))
+
+
+class TestPrefilter(TestCase):
+    def test_accepts(self):
+        prefilter = Prefilter(PatternSeq(PatternLexeme('иметь'), PatternUnit(ANY), PatternWord('в')))
+        self.assertTrue(prefilter.accepts('он имел дом в деревне'))
+        self.assertFalse(prefilter.accepts('он купил дом в деревне'))
+        self.assertFalse(prefilter.accepts(Seq('он имел дом на берегу')))
+
+    def test_unknown(self):
+        prefilter = Prefilter(PatternLexeme('стол'))
+        self.assertFalse(prefilter.accepts('зеленая лампа'))
+        self.assertTrue(prefilter.accepts('глокая куздра'))
+        self.assertTrue(prefilter.accepts('Столы'))
+
+    def test_starts(self):
+        prefilter = Prefilter(PatternSeq(PatternWord('в'), NOUN))
+        self.assertEqual(prefilter.starts('стол в углу в доме'), [1, 3])
+        self.assertEqual(Prefilter(PatternSeq(ADJF, NOUN)).starts('зеленый стол'), [0, 1])
+
+    def test_search(self):
+        prefilter = Prefilter(PatternSeq(ADJF, PatternLexeme('стол')))
+        self.assertEqual(prefilter.search('большой зеленый стол').seq.text, 'зеленый стол')
+        self.assertEqual(prefilter.search('большой зеленый стул'), None)
+        self.assertEqual(prefilter.findall('зеленая лампа'), [])
+        self.assertEqual(list(prefilter.filter(['зеленый стол', 'лампа', 'столы'])), ['зеленый стол', 'столы'])
+
+
+if __name__ == '__main__':
+    unittest.main()
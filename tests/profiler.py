@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+from unittest import main, TestCase, skip
+from polymorphy import Seq
+from polymorphy import dsl
+from polymorphy.constants import *
+from polymorphy.patterns import *
+from polymorphy.profiler import *
+
+
+class TestProfile(TestCase):
+    def setUp(self):
+        self.noun    = PatternUnit(NOUN)
+        self.adjf    = PatternUnit(ADJF)
+        self.pattern = PatternSeq(PatternRepeat(self.adjf), self.noun)
+        self.seq     = Seq('тихий скрип медной ручки')
+
+    def test_stats(self):
+        profile = Profile()
+        match   = self.pattern.match(self.seq, profile = profile)
+        self.assertEqual(match.seq, self.pattern.match(self.seq).seq)
+        self.assertEqual(profile.get(self.pattern).calls, 1)
+        self.assertEqual(profile.get(self.pattern).matches, 1)
+        self.assertEqual(profile.get(self.noun).matches, 1)
+        self.assertEqual(profile.get(self.noun).failures, 0)
+        self.assertTrue(profile.get(self.pattern).time >= profile.get(self.noun).time)
+
+    def test_backtracks(self):
+        profile = Profile()
+        pattern = PatternSeq(PatternRepeat(ANY), PatternWord('ручки'))
+        self.assertEqual(pattern.match('тихий медной ручки', profile = profile).seq.text, 'тихий медной ручки')
+        stats = profile.get(pattern.rest)
+        self.assertTrue(stats.failures > 0)
+        self.assertTrue(profile.get(pattern.parts[0]).backtracks > 0)
+
+    def test_accumulates(self):
+        profile = Profile()
+        self.pattern.findall(self.seq, profile = profile)
+        calls = profile.get(self.pattern).calls
+        self.pattern.findall(self.seq, profile = profile)
+        self.assertEqual(profile.get(self.pattern).calls, 2 * calls)
+        profile.clear()
+        self.assertEqual(profile.get(self.pattern), None)
+
+    def test_disabled(self):
+        self.assertEqual(MatchContext.create(), None)
+        self.assertTrue(MatchContext.create(profile = Profile()).exact().profile is not None)
+        self.assertTrue(type(MatchContext.create(packrat = True, steps = 10)) is MatchContext)
+        self.assertTrue(type(MatchContext.create(packrat = True, profile = Profile()).exact()) is ProfiledContext)
+
+    def test_packrat(self):
+        profile = Profile()
+        pattern = PatternSeq(PatternRepeat(PatternAny(ADJF, PatternUnit(ANY))), PatternWord('конец'))
+        self.assertEqual(pattern.match(Seq(' '.join(['зеленый'] * 20)), packrat = True, profile = profile), None)
+        self.assertEqual(profile.get(pattern.parts[1]).calls, 20)
+
+    def test_trace(self):
+        profile = Profile(trace = True)
+        self.pattern.match(self.seq, profile = profile)
+        events = [(e.event, e.lvl, e.pattern) for e in profile.events]
+        self.assertEqual(events[0], ('call', 0, self.pattern))
+        self.assertTrue(('match', 0, self.pattern) in events)
+        self.assertTrue(all(e.lvl > 0 for e in profile.events if e.pattern is self.noun))
+        self.assertEqual(Profile().events, [])
+
+    def test_export(self):
+        profile = Profile(trace = True)
+        self.pattern.findall(self.seq, profile = profile)
+        with tempfile.TemporaryDirectory() as path:
+            path = os.path.join(path, 'profile.json')
+            profile.dump(path)
+            with open(path, 'r') as file: exported = json.load(file)
+        self.assertEqual(len(exported['nodes']), len(profile.stats))
+        self.assertEqual(len(exported['events']), len(profile.events))
+        self.assertTrue(set(n['node'] for n in exported['nodes']) >= {'Unit(NOUN)', 'Repeat(0:)'})
+
+    def test_report(self):
+        rule    = dsl.source('seq { repeat { ADJF } NOUN }')
+        profile = Profile()
+        rule.pattern.findall(self.seq, profile = profile)
+        lines = profile.report(rule).split('\n')
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(lines[1].endswith('  seq { repeat { ADJF } NOUN }'))
+        self.assertTrue(lines[3].endswith('      ADJF'))
+        self.assertEqual(len(profile.report().split('\n')), len(profile.stats) + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
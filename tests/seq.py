@@ -1,3 +1,4 @@
+import pickle
 from unittest import main, TestCase, skip
 from polymorphy import Seq
 from polymorphy.constants import PREP, gent, plur
@@ -52,6 +53,77 @@ class TestSeq(TestCase):
         inf = seq.inflect({gent, plur}, hard = True)
         self.assertEqual(inf, None)
 
+    def test_inflect_noinflect(self):
+        seq = Seq('стол и лампа')
+        self.assertEqual(seq.inflect({gent, plur}).text, 'столов и ламп')
+        self.assertEqual(Seq('стол говорить').inflect({gent, plur}), None)
+
+    def test_slice(self):
+        seq   = Seq('тихий скрип медной ручки')
+        view  = seq[1:3]
+        self.assertEqual(len(view), 2)
+        self.assertEqual(view.text, 'скрип медной')
+        self.assertTrue(view[0] is seq[1])
+        self.assertTrue(view[-1] is seq[2])
+        self.assertEqual(view[1:].text, 'медной')
+        self.assertEqual(view[5:].text, '')
+        self.assertEqual(seq[::2].text, 'тихий медной')
+        self.assertEqual(view, Seq('скрип медной'))
+        self.assertEqual(hash(view), hash(Seq('скрип медной')))
+        with self.assertRaises(IndexError): view[2]
+
+    def test_slice_words(self):
+        seq  = Seq('тихий скрип медной ручки')
+        view = seq[1:3]
+        self.assertEqual([w.text for w in view.words], ['скрип', 'медной'])
+        self.assertEqual(len(seq.words), 4)
+
+    def test_words_copy(self):
+        seq  = Seq('тихий скрип медной ручки')
+        view = seq[1:3]
+        key  = view.key
+        view.words
+        self.assertEqual(view.key, key)
+        self.assertEqual(view[1:].key[0], seq.key[0])
+
+        words = seq.words
+        words.pop()
+        self.assertEqual(len(seq), 4)
+        self.assertEqual(len(seq.words), 4)
+        self.assertEqual(seq.key, seq[:].key)
+
+    def test_constrain_find(self):
+        seq = Seq('зеленый большой пуговица')
+        self.assertEqual(seq.constrain_find('ADJF').text, 'зеленый большой')
+        self.assertEqual(seq.constrain_find('ANY', 1).text, 'зеленый большой')
+
+    def test_tokenize(self):
+        self.assertEqual(Seq.tokenize(' зеленый\tперец \n'), ['зеленый', 'перец'])
+
+    def test_batch(self):
+        seqs = Seq.batch(['зеленый перец', 'красный перец', ''])
+        self.assertEqual([s.text for s in seqs], ['зеленый перец', 'красный перец', ''])
+        self.assertTrue(seqs[0][1] is seqs[1][1])
+        self.assertEqual(seqs[0], Seq('зеленый перец'))
+
+    def test_batch_threshold(self):
+        seq = Seq.batch(['в из'], 0.01)[0]
+        self.assertTrue(all(PREP in v.tag.grammemes for word in seq for v in word.variants))
+
+    def test_iter_from(self):
+        lines = ['зеленый перец', 'красный перец', 'сладкий перец']
+        seqs  = list(Seq.iter_from(iter(lines), chunksize = 2))
+        self.assertEqual([s.text for s in seqs], lines)
+        self.assertTrue(seqs[0][1] is seqs[1][1])
+        self.assertFalse(seqs[0][1] is seqs[2][1])
+
+    def test_pickle(self):
+        seq  = Seq.batch(['стали стол стали'])[0]
+        data = pickle.dumps(seq)
+        self.assertEqual(pickle.loads(data), seq)
+        self.assertEqual(data.count('стали'.encode()), 1)
+        self.assertEqual(pickle.loads(pickle.dumps(seq[1:])).text, 'стол стали')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,85 @@
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import main, TestCase, skip
+from polymorphy import Seq, Word
+from polymorphy.constants import *
+from polymorphy.patterns import *
+from polymorphy.store import AnalysisStore, Variant, Tag
+
+
+class TestAnalysisStore(TestCase):
+    def setUp(self):
+        self.path  = os.path.join(tempfile.mkdtemp(), 'analysis.store')
+        self.count = AnalysisStore.build(self.path, ['зеленый стол стоит в углу', 'стали стальные столы', 'Ёж и куздра'])
+        self.store = AnalysisStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_build(self):
+        self.assertEqual(self.count, 11)
+        self.assertEqual(len(self.store), 11)
+        self.assertTrue('стали' in self.store)
+        self.assertTrue('Ёж' in self.store)
+        self.assertFalse('лампа' in self.store)
+
+    def test_variants(self):
+        stored = self.store.variants('стали')
+        parsed = Word.analyze('стали')
+        self.assertTrue(all(type(v) == Variant for v in stored))
+        self.assertEqual(
+            [(v.word, v.tag, v.normal_form, v.score) for v in stored],
+            [(v.word, v.tag, v.normal_form, v.score) for v in parsed],
+        )
+        self.assertEqual(self.store.variants('лампа'), None)
+
+    def test_word(self):
+        word = self.store.word('стали', 0.005)
+        self.assertEqual(len(word.variants), 3)
+        self.assertTrue(self.store.word('стали', 0.005) is word)
+        self.assertEqual(len(self.store.word('лампа').variants), len(Word('лампа').variants))
+
+    def test_seq(self):
+        seq = self.store.seq('зеленый стол стоит в углу')
+        self.assertEqual(PatternSeq(ADJF, NOUN).search(seq).seq.text, 'зеленый стол')
+        self.assertTrue(seq[1] is self.store.seq('стол')[0])
+        self.assertEqual([s.text for s in self.store.iter_from(['в углу', 'стол'])], ['в углу', 'стол'])
+
+    def test_tags(self):
+        stored = self.store.variants('стали')
+        parsed = Word.analyze('стали')
+        self.assertTrue(all(type(v.tag) == Tag for v in stored))
+        self.assertEqual([v.tag.grammemes for v in stored], [v.tag.grammemes for v in parsed])
+        self.assertTrue('VERB' in stored[0].tag)
+        self.assertEqual([str(v.tag) for v in stored], [str(v.tag) for v in parsed])
+
+    # Чтение хранилища и сопоставление в новом процессе не загружают pymorphy2.
+    def test_no_analyzer(self):
+        script = '''
+import sys
+from polymorphy.constants import *
+from polymorphy.patterns import *
+from polymorphy.masks import grammeme_mask
+from polymorphy.store import AnalysisStore
+with AnalysisStore(sys.argv[1]) as store:
+    seq = store.seq('зеленый стол стоит в углу')
+    print(PatternSeq(ADJF, NOUN).search(seq).seq.text)
+    print(PatternAll(NOUN, inan, sing, PatternLexeme('угол')).search(seq).seq.text)
+    print(grammeme_mask('Name') != 0, 'pymorphy2' in sys.modules)
+'''
+        output = subprocess.check_output([sys.executable, '-c', script, self.path], universal_newlines = True)
+        self.assertEqual(output.split('\n')[:3], ['зеленый стол', 'углу', 'True False'])
+
+    def test_inflect(self):
+        seq = self.store.seq('стальные столы')
+        self.assertEqual(seq.inflect({'sing', 'gent'}).text, 'стального стола')
+
+    def test_format(self):
+        with open(self.path, 'wb') as file: file.write(b'0' * 64)
+        with self.assertRaises(ValueError): AnalysisStore(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
+import pickle
+import subprocess
+import sys
 from unittest import main, TestCase, skip
 from polymorphy import Word
-from polymorphy.constants import PREP, plur, nomn, gent, accs
+from polymorphy.constants import NOUN, ADJF, PREP, plur, nomn, gent, accs
+from polymorphy.masks import grammeme_mask
 
 
 class TestWord(TestCase):
@@ -24,6 +28,28 @@ class TestWord(TestCase):
         self.assertTrue(any(accs in v.tag.grammemes for v in word.variants))
         self.assertFalse(any(accs in v.tag.grammemes for v in constrained.variants))
 
+    def test_constrain_mask(self):
+        word = Word('стали')
+        self.assertEqual(len(word.masks), len(word.variants))
+        self.assertEqual(word.constrain_mask(grammeme_mask(NOUN, plur)).variants, word.constrain(NOUN).constrain(plur).variants)
+        self.assertEqual(word.constrain('unknown'), None)
+        self.assertEqual(word.constrain(ADJF), None)
+
+    def test_constrain_memo(self):
+        word = Word('стали')
+        self.assertTrue(word.constrain(NOUN) is word.constrain(NOUN))
+        self.assertTrue(word.constrain_normal_form('сталь') is word.constrain_normal_form('сталь'))
+        self.assertFalse(word.constrain(NOUN) is word.constrain(plur))
+        self.assertEqual(word.constrain(ADJF), None)
+        self.assertEqual(word.constrain(ADJF), None)
+        self.assertEqual(word.constrain_normal_form('стол'), None)
+
+    def test_constrain_memo_limit(self):
+        word = Word('стали')
+        for i in range(Word.constrain_cache_size): word.constrain_normal_form(str(i))
+        self.assertFalse(word.constrain(NOUN) is word.constrain(NOUN))
+        self.assertEqual(word.constrain(NOUN).variants, word.constrain(NOUN).variants)
+
     def test_constrain_nf(self):
         word = Word('лалала')
         constrained = word.constrain_normal_form('лалал')
@@ -48,6 +74,92 @@ class TestWord(TestCase):
         self.assertEqual(Word('говорить').inflect({plur, gent}), None)
         self.assertEqual(Word('на').inflect({plur, gent}), None)
 
+    def test_inflect_cache(self):
+        Word.inflect_cache.clear()
+        infd = Word('изба').inflect({plur, gent})
+        self.assertTrue(Word('изба').inflect([gent, plur]) is infd)
+        self.assertEqual(Word('говорить').inflect({plur, gent}), None)
+        self.assertEqual(Word('говорить').inflect({plur, gent}), None)
+        self.assertEqual((Word.inflect_cache.hits, Word.inflect_cache.misses), (2, 2))
+
+    def test_mask(self):
+        word = Word('стали')
+        self.assertEqual(word.mask & grammeme_mask(NOUN), grammeme_mask(NOUN))
+        self.assertEqual(word.mask & grammeme_mask(PREP), 0)
+        self.assertEqual(word.constrain(NOUN).mask & grammeme_mask('VERB'), 0)
+
+    def test_cache(self):
+        Word.cache.clear()
+        word1 = Word('стол')
+        word2 = Word('стол')
+        self.assertTrue(word1.variants is word2.variants)
+        self.assertEqual((Word.cache.hits, Word.cache.misses), (1, 1))
+        self.assertFalse(Word('стол', 0.5).variants is word1.variants)
+
+    def test_prewarm(self):
+        Word.cache.clear()
+        Word.prewarm(['и', 'в', 'на'])
+        self.assertEqual(len(Word.cache), 3)
+        Word('и').variants
+        self.assertEqual(Word.cache.hits, 1)
+
+    def test_lexeme_forms(self):
+        forms = Word.lexeme_forms('сталь')
+        self.assertTrue('стали' in forms)
+        self.assertTrue('сталью' in forms)
+        self.assertFalse('стол' in forms)
+        self.assertTrue('еж' in Word.lexeme_forms('ёж'))
+        self.assertTrue(Word.lexeme_forms('сталь') is forms)
+
+    def test_is_known(self):
+        self.assertTrue(Word.is_known('Стол'))
+        self.assertTrue(Word.is_known('ёжик'))
+        self.assertFalse(Word.is_known('глокая'))
+
+    def test_pickle(self):
+        word = Word('стали')
+        self.assertEqual(pickle.loads(pickle.dumps(word)).variants, word.variants)
+        word = Word('стали').constrain(NOUN)
+        self.assertEqual(pickle.loads(pickle.dumps(word)).variants, word.variants)
+        word = Word('изба').inflect({plur, gent})
+        self.assertEqual(pickle.loads(pickle.dumps(word)).variants, word.variants)
+        word = pickle.loads(pickle.dumps(Word('в', 0.01)))
+        self.assertEqual(word.threshold, 0.01)
+        self.assertEqual(word.variants, Word('в', 0.01).variants)
+
+
+
+class TestMorph(TestCase):
+    def test_lazy(self):
+        script = '''
+import sys, polymorphy
+from polymorphy import Word
+from polymorphy.constants import NOUN
+from polymorphy.masks import grammeme_mask
+grammeme_mask(NOUN)
+print(Word._Word__backend is None, 'pymorphy2' in sys.modules, polymorphy.dsl.parser._LazyParser__parser is None)
+polymorphy.warmup()
+print(Word.default_backend()._Pymorphy2Backend__morph is None, polymorphy.dsl.parser._LazyParser__parser is None)
+'''
+        output = subprocess.check_output([sys.executable, '-c', script], universal_newlines = True)
+        self.assertEqual(output.split('\n')[:2], ['True False True', 'False False'])
+
+    def test_set_morph(self):
+        backend = Word.default_backend()
+        morph   = backend.morph
+        class CountingMorph(object):
+            def __init__(self): self.calls = 0
+            def parse(self, text):
+                self.calls += 1
+                return morph.parse(text)
+        counting = CountingMorph()
+        try:
+            Word.set_morph(counting)
+            self.assertEqual(len(Word('стол').variants), len(morph.parse('стол')))
+            self.assertEqual(counting.calls, 1)
+        finally:
+            Word.set_backend(backend)
+        self.assertTrue(Word.default_backend().morph is morph)
 
 if __name__ == '__main__':
     unittest.main()